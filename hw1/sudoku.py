@@ -3,6 +3,9 @@
 import sys, os
 import argparse
 import math
+import json
+import time
+import multiprocessing
 from codetiming import Timer
 
 from sudoku_core import solve_sudoku_SAT
@@ -10,20 +13,93 @@ from sudoku_core import solve_sudoku_CSP
 from sudoku_core import solve_sudoku_ASP
 from sudoku_core import solve_sudoku_ILP
 from sudoku_core import propagate
+from sudoku_core import solve_sudoku_bitmask
+from sudoku_core import peer_table
+from sudoku_core import PROPAGATION_RULES
+from sudoku_core import sat_session
+from sudoku_core import asp_session
+from sudoku_core import ILP_BACKENDS
+from sudoku_core import solve_sudoku_DLX
+from sudoku_core import sudoku_solutions
+from sudoku_core import count_sudoku_solutions
+from sudoku_core import SOLUTION_BACKENDS
+from sudoku_core import AMO_ENCODINGS
+from sudoku_core import ASP_AMO_ENCODINGS
+from sudoku_core import solve_sudoku_portfolio
+from sudoku_corpus import iter_line_corpus
+from sudoku_corpus import iter_binary_corpus
+from sudoku_corpus import is_line_corpus
+from sudoku_corpus import is_binary_corpus
+from sudoku_corpus import input_filenames
+from sudoku_cache import sudoku_cache
+from sudoku_cache import DEFAULT_MAX_ENTRIES
 
 ### Main
 def main():
     # Take command line arguments
     parser = argparse.ArgumentParser();
     # parser.add_argument("input", help="Input file");
-    parser.add_argument("-i", "--input", required=True, help="input file")
+    parser.add_argument("-i", "--input", required=True, help="input file (in batch mode: a directory, a glob pattern, a file with one sudoku per line, or a corpus, see sudoku_corpus.py; a .sudoku file holds a single sudoku, other files one sudoku per line)")
     parser.add_argument("-v", "--verbose", help="verbose mode", action="store_true")
-    parser.add_argument("-s", "--solver", choices=["sat", "csp", "asp", "ilp", "prop"], default="prop", help="selects which solver to use (default: prop)");
-    args = parser.parse_args(map(lambda x: x.lower(),sys.argv[1:]));
+    parser.add_argument("--batch", help="batch mode: solve all sudoku's in the input, and write results as JSON lines", action="store_true")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes in batch mode (default: number of cpus)")
+    parser.add_argument("-s", "--solver", type=str.lower, choices=["sat", "csp", "asp", "ilp", "prop", "dlx", "portfolio"], default="prop", help="selects which solver to use, portfolio races all of them (default: prop)");
+    parser.add_argument("-d", "--domains", type=str.lower, choices=["list", "bitmask"], default="list", help="selects how the prop solver stores possible values (default: list)");
+    parser.add_argument("-b", "--branching", type=str.lower, choices=["first", "mrv", "mrv-degree"], default=None, help="selects the cell to branch on, with bitmask domains (default: mrv)");
+    parser.add_argument("--value-order", type=str.lower, choices=["natural", "lcv"], default=None, help="selects the order of values to try, with bitmask domains (default: natural)");
+    parser.add_argument("--amo", type=str.lower, choices=list(AMO_ENCODINGS) + ["cardinality"], default="pairwise", help="selects the at-most-one encoding, for the sat solver (pairwise, sequential, commander, product, bimander) and the asp solver (pairwise, cardinality) (default: pairwise)");
+    parser.add_argument("--search-workers", type=int, default=None, help="number of parallel search workers of the csp solver (default: all cpus, 1 in batch mode)");
+    parser.add_argument("--time-limit", type=float, default=None, help="time limit in seconds of the csp solver (default: none)");
+    parser.add_argument("--ilp-backend", type=str.lower, choices=ILP_BACKENDS, default="auto", help="selects the solver of the ilp encoding, auto uses gurobi if it is available and ortools otherwise (default: auto)");
+    parser.add_argument("-m", "--mode", type=str.lower, choices=["first", "count", "all"], default="first", help="find the first solution, count the solutions, or print all solutions (default: first)");
+    parser.add_argument("--limit", type=int, default=None, help="with --mode count or all: stop after this many solutions, e.g. 2 to check if the solution is unique (default: none)");
+    parser.add_argument("-r", "--rules", nargs="*", type=str.lower, choices=PROPAGATION_RULES, default=None, help="selects the extra propagation rules, with bitmask domains (default: all)");
+    parser.add_argument("--cache", default=None, help="sqlite file with solutions of earlier sudoku's, also of sudoku's that are the same up to symmetry; solutions are looked up there first, and stored there after solving (default: no cache)");
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES, help="number of solutions the cache keeps, the least recently used ones are removed (default: " + str(DEFAULT_MAX_ENTRIES) + ")");
+    # Option names and choices are case-insensitive (the choices are lowercased by their type), but paths are not
+    args = parser.parse_args(map(lower_option_name,sys.argv[1:]));
+    # --amo lists the encodings of both solvers, but each solver only has its own
+    if args.solver == "sat" and args.amo not in AMO_ENCODINGS:
+        parser.error("--amo " + args.amo + " is not an encoding of the sat solver (choose from " + ", ".join(AMO_ENCODINGS) + ")");
+    if args.solver == "asp" and args.amo not in ASP_AMO_ENCODINGS:
+        parser.error("--amo " + args.amo + " is not an encoding of the asp solver (choose from " + ", ".join(ASP_AMO_ENCODINGS) + ")");
+
+    # -b, --value-order and -r only apply to bitmask domains
+    if args.domains == "list" and (args.branching != None or args.value_order != None or args.rules != None):
+        parser.error("-b/--branching, --value-order and -r/--rules need bitmask domains (-d bitmask)");
+    if args.branching == None:
+        args.branching = "mrv";
+    if args.value_order == None:
+        args.value_order = "natural";
+    if args.rules == None:
+        args.rules = PROPAGATION_RULES;
 
     input = args.input;
     verbose = args.verbose;
     solver = args.solver;
+    domains = args.domains;
+    branching = args.branching;
+    value_order = args.value_order;
+    rules = args.rules;
+    amo = args.amo;
+    csp_options = {"workers": args.search_workers, "time_limit": args.time_limit};
+    ilp_backend = args.ilp_backend;
+    cache_options = None;
+    if args.cache != None:
+        cache_options = {"path": args.cache, "max_entries": args.cache_size};
+
+    # In batch mode, solve all sudoku's in the input with a pool of workers
+    if args.batch:
+        prop_options = {"domains": domains, "branching": branching, "value_order": value_order, "rules": rules};
+        # The pool already uses the cpus, so by default each csp solve gets one search worker
+        if csp_options["workers"] == None:
+            csp_options["workers"] = 1;
+        # The portfolio starts a process per solver itself (and pool workers cannot start processes)
+        workers = args.workers;
+        if solver == "portfolio":
+            workers = 1;
+        solve_batch(input, solver, prop_options, workers, amo, csp_options, ilp_backend, cache_options);
+        return;
 
     # Read sudoku from input file
     if verbose:
@@ -38,15 +114,32 @@ def main():
         print("Input sudoku:");
         print(pretty_repr(sudoku,k));
 
-    # Solve the sudoku using the selected solver
+    # In count and all mode, print the (number of) solutions instead of a single solution
+    if args.mode != "first":
+        print_solutions(solver,sudoku,k,args.mode,args.limit);
+        return;
+
+    # Look the sudoku up in the cache, if there is one
+    # (some solvers fill in the sudoku they get, so the cache keeps its own copy to store the solution under)
     solved_sudoku = None;
-    if solver == "sat":
+    cache = None;
+    if cache_options != None:
+        cache = sudoku_cache(**cache_options);
+        cached_sudoku = [row[:] for row in sudoku];
+        solved_sudoku = cache.get(cached_sudoku,k);
+    from_cache = solved_sudoku != None;
+
+    # Solve the sudoku using the selected solver
+    if from_cache:
+        if verbose:
+            print("Found the solution in the cache (" + cache_options["path"] + ")");
+    elif solver == "sat":
         timer = Timer(name="solving-time", text="Did SAT encoding & solving in {:.2f} seconds");
         if verbose:
             print("Solving sudoku using the SAT encoding..");
             timer.start();
         #with suppress_stdout_stderr():
-            solved_sudoku = solve_sudoku_SAT(sudoku,k);
+        solved_sudoku = solve_sudoku_SAT(sudoku,k,amo=amo);
         if verbose:
             timer.stop();
     elif solver == "csp":
@@ -55,7 +148,7 @@ def main():
             print("Solving sudoku using the CSP encoding..");
             timer.start();
         #with suppress_stdout_stderr():
-            solved_sudoku = solve_sudoku_CSP(sudoku,k);
+        solved_sudoku = solve_sudoku_CSP(sudoku,k,**csp_options);
         if verbose:
             timer.stop();
     elif solver == "asp":
@@ -64,7 +157,7 @@ def main():
             print("Solving sudoku using the ASP encoding..");
             timer.start();
         #with suppress_stdout_stderr():
-            solved_sudoku = solve_sudoku_ASP(sudoku,k);
+        solved_sudoku = solve_sudoku_ASP(sudoku,k,amo=amo);
         if verbose:
             timer.stop();
     elif solver == "ilp":
@@ -73,7 +166,7 @@ def main():
             print("Solving sudoku using the ILP encoding..");
             timer.start();
         #with suppress_stdout_stderr():
-            solved_sudoku = solve_sudoku_ILP(sudoku,k);
+        solved_sudoku = solve_sudoku_ILP(sudoku,k,ilp_backend);
         if verbose:
             timer.stop();
     elif solver == "prop":
@@ -82,9 +175,33 @@ def main():
             print("Solving sudoku using recursion and propagation..");
             timer.start();
         #with suppress_stdout_stderr():
-            solved_sudoku = solve_sudoku_prop(sudoku,k);
+        solved_sudoku = solve_sudoku_prop(sudoku,k,domains,branching,value_order,rules);
+        if verbose:
+            timer.stop();
+    elif solver == "dlx":
+        timer = Timer(name="solving-time", text="Did exact cover solving in {:.2f} seconds");
+        if verbose:
+            print("Solving sudoku using exact cover (dancing links)..");
+            timer.start();
+        #with suppress_stdout_stderr():
+        solved_sudoku = solve_sudoku_DLX(sudoku,k);
+        if verbose:
+            timer.stop();
+    elif solver == "portfolio":
+        timer = Timer(name="solving-time", text="Did portfolio solving in {:.2f} seconds");
+        if verbose:
+            print("Solving sudoku using a portfolio of all solvers..");
+            timer.start();
+        #with suppress_stdout_stderr():
+        portfolio_stats = {};
+        solved_sudoku = solve_sudoku_portfolio(sudoku,k,stats=portfolio_stats);
         if verbose:
             timer.stop();
+            print("Winning solver: " + str(portfolio_stats["winner"]));
+
+    # Store the solution in the cache (a found one is already there)
+    if cache != None and not from_cache:
+        cache.put(cached_sudoku,k,solved_sudoku);
 
     # Print the solved sudoku
     if solved_sudoku == None:
@@ -99,31 +216,22 @@ def main():
 
 ### Check if a solved sudoku is correct
 def check_solved_sudoku(sudoku,k):
-    # Check if each row has different values
-    # (return False if not)
-    for row in sudoku:
-        if set(row) != set(range(1,k**2+1)):
-            return False;
-    # Check if each row has different values
+    # Check if each row, column and block has different values
     # (return False if not)
-    for j in range(k**2):
-        if set(sudoku[i][j] for i in range(k**2)) != set(range(1,k**2+1)):
+    all_values = set(range(1,k**2+1));
+    for unit in peer_table(k).units:
+        if set(sudoku[cell // k**2][cell % k**2] for cell in unit) != all_values:
             return False;
-    # Check if each block has different values
-    # (return False if not)
-    for i1 in range(0,k):
-        for j1 in range(0,k):
-            values = [];
-            for i2 in range(0,k):
-                for j2 in range(0,k):
-                    i = i1*k + i2;
-                    j = j1*k + j2;
-                    values.append(sudoku[i][j]);
-            if set(values) != set(range(1,k**2+1)):
-                return False;
     # If no check failed, return True
     return True;
 
+### Lowercase the name of an option (e.g. -S or --Cache=Cache.db), and leave other arguments as they are
+def lower_option_name(argument):
+    if not argument.startswith("-"):
+        return argument;
+    name, separator, value = argument.partition("=");
+    return name.lower() + separator + value;
+
 ### Read sudoku from file
 def read_sudoku_from_file(filename):
     try:
@@ -155,6 +263,64 @@ def read_sudoku_from_file(filename):
         print("Something went wrong while reading from " + filename + " (" + str(e) + ")");
         return None,None;
 
+### Read all sudoku's from a file
+def read_sudokus_from_file(filename):
+    # The file either contains a single sudoku (in the format of read_sudoku_from_file),
+    # or one sudoku per line: k**4 numbers separated by spaces, row by row,
+    # or (for k=3) 81 characters, where 0 or . is an empty cell.
+    # Returns a list of (k,sudoku) pairs, with (None,None) for lines in the wrong format
+    # A file of n lines with n numbers each, for n = k**2, can be both (e.g. one 16x16 sudoku, or 16 sudoku's of 16 numbers),
+    # so the extension decides: a .sudoku file is read as a single sudoku, other files as one sudoku per line.
+    # The other format is only used if the file is not in that format at all
+    # (a .sudoku file that is not a single sudoku, or a file of which no line is a sudoku, but which is a single sudoku)
+    file = open(filename, "r");
+    lines = [line.split() for line in file.readlines() if line.strip() != ""];
+    file.close();
+    grid = parse_sudoku_grid(lines);
+    if filename.endswith(".sudoku"):
+        if grid[1] != None:
+            return [grid];
+        return [parse_sudoku_line(line) for line in lines];
+    sudokus = [parse_sudoku_line(line) for line in lines];
+    if grid[1] != None and all(sudoku == None for k,sudoku in sudokus):
+        return [grid];
+    return sudokus;
+
+### Parse a sudoku written as rows (already split on whitespace), like read_sudoku_from_file
+def parse_sudoku_grid(lines):
+    height = len(lines);
+    k = int(round(math.sqrt(height)));
+    if height != k**2 or k < 1:
+        return None,None;
+    try:
+        sudoku = [list(map(int,line)) for line in lines];
+    except ValueError:
+        return None,None;
+    for row in sudoku:
+        if len(row) != height:
+            return None,None;
+        for entry in row:
+            if not (0 <= entry and entry <= height):
+                return None,None;
+    return (k,sudoku);
+
+### Parse a sudoku written on a single line (already split on whitespace)
+def parse_sudoku_line(tokens):
+    if len(tokens) == 1 and len(tokens[0]) == 81:
+        tokens = ["0" if char == "." else char for char in tokens[0]];
+    try:
+        entries = list(map(int,tokens));
+    except ValueError:
+        return None,None;
+    k = int(round(len(entries) ** 0.25));
+    if len(entries) != k**4 or k < 1:
+        return None,None;
+    for entry in entries:
+        if not (0 <= entry and entry <= k**2):
+            return None,None;
+    sudoku = [entries[i*k**2:(i+1)*k**2] for i in range(k**2)];
+    return (k,sudoku);
+
 ### Plain representation (for file storage)
 def plain_repr(sudoku,k):
     repr = "";
@@ -220,15 +386,141 @@ class suppress_stdout_stderr(object):
         # Re-assign the real stdout/stderr back to (1) and (2)
         os.dup2(self.save_fds[0],1)
         os.dup2(self.save_fds[1],2)
-        # Close the null files
+        # Close the null files, and the copies of the real stdout/stderr
+        # (batch mode enters this once per sudoku, so leaving them open runs out of file descriptors)
         os.close(self.null_fds[0])
         os.close(self.null_fds[1])
+        os.close(self.save_fds[0])
+        os.close(self.save_fds[1])
 
 
+###
+### Batch mode
+###
+
+### Solve a sudoku with one of the solvers (by its abbreviation)
+def solve_with(solver,sudoku,k,prop_options=None,amo="pairwise",csp_options=None,stats=None,ilp_backend="auto"):
+    # The solvers may change the sudoku they get, so they get a copy
+    sudoku = [row[:] for row in sudoku];
+    if solver == "sat":
+        # Each worker keeps one SAT session per k, so the structure is only encoded once
+        return solve_sudoku_SAT(sudoku,k,session=sat_session(k,amo));
+    elif solver == "csp":
+        return solve_sudoku_CSP(sudoku,k,**(csp_options or {}));
+    elif solver == "asp":
+        # Each worker keeps one ASP session per k, so the structure is only grounded once
+        return solve_sudoku_ASP(sudoku,k,session=asp_session(k,amo));
+    elif solver == "ilp":
+        return solve_sudoku_ILP(sudoku,k,ilp_backend);
+    elif solver == "prop":
+        return solve_sudoku_prop(sudoku,k,**(prop_options or {}));
+    elif solver == "dlx":
+        return solve_sudoku_DLX(sudoku,k);
+    elif solver == "portfolio":
+        return solve_sudoku_portfolio(sudoku,k,stats=stats);
+
+### Count or print the solutions of a sudoku (streamed from the solver, see sudoku_solutions)
+def print_solutions(solver,sudoku,k,mode,limit=None):
+    if solver not in SOLUTION_BACKENDS:
+        print("Solver " + solver + " cannot count or list solutions");
+        return;
+    if mode == "count":
+        print("Number of solutions: " + str(count_sudoku_solutions(sudoku,k,solver,limit)));
+        return;
+    count = 0;
+    solutions = sudoku_solutions(sudoku,k,solver);
+    try:
+        for solution in solutions:
+            print(pretty_repr(solution,k));
+            count += 1;
+            if limit != None and count >= limit:
+                break;
+    finally:
+        solutions.close();
+    print("Number of solutions: " + str(count));
+
+### Find the sudoku's for batch mode
+def batch_jobs(input,solver,prop_options,amo="pairwise",csp_options=None,ilp_backend="auto",cache_options=None):
+    # The input is a directory (all *.sudoku files and corpora in it), a glob pattern or a single file
+    # Corpora (see sudoku_corpus.py) are streamed, other files are read at once
+    for filename in input_filenames(input):
+        try:
+            if is_binary_corpus(filename):
+                sudokus = iter_binary_corpus(filename);
+            elif is_line_corpus(filename):
+                sudokus = iter_line_corpus(filename);
+            else:
+                sudokus = read_sudokus_from_file(filename);
+        except Exception as e:
+            yield {"input": filename, "index": 0, "error": str(e)};
+            continue;
+        for index, (k,sudoku) in enumerate(sudokus):
+            if sudoku == None:
+                yield {"input": filename, "index": index, "error": "Wrong input format"};
+            else:
+                yield {"input": filename, "index": index, "k": k, "sudoku": sudoku, "solver": solver, "prop_options": prop_options, "amo": amo, "csp_options": csp_options, "ilp_backend": ilp_backend, "cache_options": cache_options};
+
+### Solve a single sudoku in batch mode (in a worker process)
+def solve_batch_job(job):
+    result = {"input": job["input"], "index": job["index"]};
+    if "error" in job:
+        result["status"] = "error";
+        result["error"] = job["error"];
+        return result;
+    k = job["k"];
+    result["k"] = k;
+    result["solver"] = job["solver"];
+    stats = {};
+    start = time.perf_counter();
+    try:
+        # The solvers might print to stdout, which would mess up the JSON lines
+        with suppress_stdout_stderr():
+            # Each worker opens the cache once, and looks every sudoku up there first
+            solved_sudoku = None;
+            if job["cache_options"] != None:
+                cache = sudoku_cache(**job["cache_options"]);
+                solved_sudoku = cache.get(job["sudoku"],k);
+                result["cached"] = solved_sudoku != None;
+            if solved_sudoku == None:
+                solved_sudoku = solve_with(job["solver"],job["sudoku"],k,job["prop_options"],job["amo"],job["csp_options"],stats,job["ilp_backend"]);
+                if job["cache_options"] != None:
+                    cache.put(job["sudoku"],k,solved_sudoku);
+    except Exception as e:
+        result["status"] = "error";
+        result["error"] = str(e);
+        return result;
+    result["seconds"] = time.perf_counter() - start;
+    # The portfolio records which solver won
+    if "winner" in stats:
+        result["winner"] = stats["winner"];
+    if solved_sudoku == None:
+        result["status"] = "no_solution";
+    else:
+        result["status"] = "solved" if check_solved_sudoku(solved_sudoku,k) else "incorrect";
+        result["solution"] = solved_sudoku;
+    return result;
+
+### Solve all sudoku's in the input, and stream the results as JSON lines (in the order they finish)
+def solve_batch(input,solver,prop_options,workers=None,amo="pairwise",csp_options=None,ilp_backend="auto",cache_options=None):
+    jobs = batch_jobs(input,solver,prop_options,amo,csp_options,ilp_backend,cache_options);
+    if workers == 1:
+        results = map(solve_batch_job, jobs);
+        for result in results:
+            print(json.dumps(result), flush=True);
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for result in pool.imap_unordered(solve_batch_job, jobs):
+                print(json.dumps(result), flush=True);
+
 ###
 ### Solver that uses recursion and propagation
 ###
-def solve_sudoku_prop(sudoku,k):
+def solve_sudoku_prop(sudoku,k,domains="list",branching="mrv",value_order="natural",rules=PROPAGATION_RULES):
+
+    # The bitmask representation has its own solver in sudoku_core
+    # (branching, value_order and rules only apply there)
+    if domains == "bitmask":
+        return solve_sudoku_bitmask(sudoku,k,branching=branching,value_order=value_order,rules=rules);
 
     # Initialize data structure
     sudoku_possible_values = [];
@@ -259,43 +551,17 @@ def solve_sudoku_prop(sudoku,k):
                 possibilities = sudoku_possible_values[i][j];
                 if len(possibilities) == 0:
                     return True;
-        # Contradiction type 2a: two cells in the same row are assigned the same value
-        for i in range(k**2):
-            certain_values = [];
-            for j in range(k**2):
-                possibilities = sudoku_possible_values[i][j];
-                if len(possibilities) == 1:
-                    value = possibilities[0];
-                    if value in certain_values:
-                        return True;
-                    else:
-                        certain_values.append(value);
-        # Contradiction type 2b: two cells in the same column are assigned the same value
-        for j in range(k**2):
+        # Contradiction type 2: two cells in the same row, column or block are assigned the same value
+        for unit in peer_table(k).units:
             certain_values = [];
-            for i in range(k**2):
-                possibilities = sudoku_possible_values[i][j];
+            for cell in unit:
+                possibilities = sudoku_possible_values[cell // k**2][cell % k**2];
                 if len(possibilities) == 1:
                     value = possibilities[0];
                     if value in certain_values:
                         return True;
                     else:
                         certain_values.append(value);
-        # Contradiction type 2c: two cells in the same block are assigned the same value
-        for i1 in range(k):
-            for j1 in range(k):
-                certain_values = [];
-                for i2 in range(k):
-                    for j2 in range(k):
-                        i = i1*k + i2;
-                        j = j1*k + j2;
-                        possibilities = sudoku_possible_values[i][j];
-                        if len(possibilities) == 1:
-                            value = possibilities[0];
-                            if value in certain_values:
-                                return True;
-                            else:
-                                certain_values.append(value);
         return False;
 
     # Make a deep copy
@@ -310,15 +576,18 @@ def solve_sudoku_prop(sudoku,k):
         return copy;
 
     # Recursive function to solve the sudoku, using propagate()
-    def solve_recursively(sudoku_possible_values):
-        # Check if we ran into a contradiction:
-        if contradiction(sudoku_possible_values):
+    # (queue holds the cell that was just guessed: the rest was already propagated before the guess,
+    # so only that cell's value has to be removed from its peers; at the start, queue is None and all cells are queued)
+    def solve_recursively(sudoku_possible_values,queue=None):
+        # Check if we ran into a contradiction (after a guess there can be none yet, see propagate())
+        if queue == None and contradiction(sudoku_possible_values):
             return None;
         else:
             # Propagate
-            sudoku_possible_values = propagate(sudoku_possible_values,k);
-            # Check for contradictions
-            if contradiction(sudoku_possible_values):
+            # (None if it ran into a contradiction: when it returns the values, every certain value is removed from its peers,
+            # so there are no empty cells and no unit with a value twice)
+            sudoku_possible_values = propagate(sudoku_possible_values,k,queue);
+            if sudoku_possible_values == None:
                 return None;
             # Find a cell that is still uncertain
             uncertain_cell = find_uncertain_cell(sudoku_possible_values);
@@ -331,7 +600,7 @@ def solve_sudoku_prop(sudoku,k):
                 for poss in possibilities:
                     sudoku_possible_values_copy = deep_copy(sudoku_possible_values);
                     sudoku_possible_values_copy[i][j] = [poss];
-                    answer = solve_recursively(sudoku_possible_values_copy);
+                    answer = solve_recursively(sudoku_possible_values_copy,[i*k**2 + j]);
                     if answer != None:
                         return answer;
             # If no solution was found in the recursion, conclude there is no solution
@@ -0,0 +1,184 @@
+#!python
+
+import sys, os
+import argparse
+import json
+import random
+import statistics
+import platform
+import time
+import multiprocessing
+
+from sudoku_core import solve_sudoku_SAT
+from sudoku_core import solve_sudoku_CSP
+from sudoku_core import solve_sudoku_ASP
+from sudoku_core import solve_sudoku_ILP
+from sudoku_core import solve_sudoku_bitmask
+from sudoku_core import solve_sudoku_DLX
+from sudoku_core import sat_session
+from sudoku_core import asp_session
+from sudoku_core import is_valid_solution
+from sudoku_core import SolverStats
+from sudoku import batch_jobs
+from sudoku import suppress_stdout_stderr
+from sudoku_generator import pattern_solution
+from sudoku_generator import shuffle_solution
+from sudoku_generator import random_clues
+
+### The solvers of the benchmark, by name
+# Each takes (sudoku,k,stats), and records the time per phase in stats["timings"]
+# (encode, ground, solve, decode; see timed_phase in sudoku_core)
+BENCH_SOLVERS = {
+    "prop": lambda sudoku,k,stats: solve_sudoku_bitmask(sudoku,k,stats=stats),
+    "dlx": lambda sudoku,k,stats: solve_sudoku_DLX(sudoku,k,stats=stats),
+    "sat": lambda sudoku,k,stats: solve_sudoku_SAT(sudoku,k,stats=stats),
+    "sat-session": lambda sudoku,k,stats: solve_sudoku_SAT(sudoku,k,session=sat_session(k),stats=stats),
+    "csp": lambda sudoku,k,stats: solve_sudoku_CSP(sudoku,k,stats=stats),
+    "asp": lambda sudoku,k,stats: solve_sudoku_ASP(sudoku,k,amo="cardinality",stats=stats),
+    "asp-session": lambda sudoku,k,stats: solve_sudoku_ASP(sudoku,k,session=asp_session(k,"cardinality"),stats=stats),
+    "ilp": lambda sudoku,k,stats: solve_sudoku_ILP(sudoku,k,stats=stats),
+};
+
+### Main
+def main():
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Benchmark the sudoku solvers on generated or given sudoku's, and write the results as JSON");
+    parser.add_argument("-i", "--input", help="sudoku's to benchmark: a directory, a glob pattern, or a file with one sudoku per line (default: generate them)");
+    parser.add_argument("-k", "--sizes", type=int, nargs="+", default=[3,4], help="sizes of the generated sudoku's (default: 3 4)");
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.3,0.5], help="fraction of the cells that are filled in, in the generated sudoku's (default: 0.3 0.5)");
+    parser.add_argument("-n", "--count", type=int, default=3, help="number of generated sudoku's per size and density (default: 3)");
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the generator (default: 0)");
+    parser.add_argument("-s", "--solvers", nargs="+", choices=list(BENCH_SOLVERS), default=["prop", "dlx", "sat", "csp", "asp", "ilp"], help="solvers to benchmark (default: prop dlx sat csp asp ilp)");
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="timed runs per sudoku and solver (default: 3)");
+    parser.add_argument("-w", "--warmup", type=int, default=1, help="untimed runs per sudoku and solver before the timed ones (default: 1)");
+    parser.add_argument("-t", "--timeout", type=float, default=None, help="seconds per run, runs then happen in a child process (default: none, all runs in this process)");
+    parser.add_argument("-o", "--output", help="file to write the JSON results to (default: stdout)");
+    args = parser.parse_args();
+
+    # Load or generate the sudoku's
+    if args.input != None:
+        instances = load_instances(args.input);
+    else:
+        instances = generate_instances(args.sizes, args.densities, args.count, args.seed);
+
+    # Run the benchmark, with progress on stderr
+    results = [];
+    for instance in instances:
+        for solver in args.solvers:
+            print("Benchmarking " + solver + " on " + instance["name"] + "..", file=sys.stderr);
+            results.extend(benchmark(instance, solver, args.repeat, args.warmup, args.timeout));
+
+    # Write the results
+    report = {
+        "config": vars(args),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": results,
+        "summary": summarize(results),
+    };
+    if args.output == None:
+        print(json.dumps(report, indent=1));
+    else:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=1);
+
+### Read the sudoku's of the input (in the formats of batch mode in sudoku.py)
+def load_instances(input):
+    instances = [];
+    for job in batch_jobs(input, None, None):
+        if "error" in job:
+            print("Skipping " + job["input"] + " (" + job["error"] + ")", file=sys.stderr);
+            continue;
+        name = os.path.basename(job["input"]);
+        if job["index"] > 0:
+            name += ":" + str(job["index"]);
+        instances.append({"name": name, "k": job["k"], "sudoku": job["sudoku"]});
+    return instances;
+
+### Generate sudoku's of the given sizes and densities
+def generate_instances(sizes, densities, count, seed):
+    rng = random.Random(seed);
+    instances = [];
+    for k in sizes:
+        for density in densities:
+            for index in range(count):
+                solution = shuffle_solution(pattern_solution(k), k, rng);
+                sudoku = random_clues(solution, k, density, rng);
+                instances.append({"name": "gen-k" + str(k) + "-d" + str(density) + "-" + str(index), "k": k, "density": density, "sudoku": sudoku});
+    return instances;
+
+### Run a solver on a sudoku: warm-up runs first (not recorded), then the timed runs
+def benchmark(instance, solver, repeat, warmup, timeout=None):
+    results = [];
+    for run in range(warmup + repeat):
+        if timeout == None:
+            result = timed_run(solver, instance["sudoku"], instance["k"]);
+        else:
+            result = timed_run_in_child(solver, instance["sudoku"], instance["k"], timeout);
+        if run >= warmup:
+            result.update({"instance": instance["name"], "k": instance["k"], "solver": solver, "run": run - warmup});
+            result["clues"] = sum(1 for row in instance["sudoku"] for value in row if value != 0);
+            results.append(result);
+    return results;
+
+### Run a solver once, and record its total time, time per phase, counters and status
+def timed_run(solver, sudoku, k):
+    stats = SolverStats();
+    start = time.perf_counter();
+    try:
+        # Some solvers print their log to stdout, which would mess up the JSON
+        with suppress_stdout_stderr():
+            solution = BENCH_SOLVERS[solver]([row[:] for row in sudoku], k, stats);
+    except Exception as e:
+        return {"status": "error", "error": str(e), "seconds": time.perf_counter() - start, "timings": stats.get("timings", {}), "counters": stats.counters()};
+    seconds = time.perf_counter() - start;
+    if solution == None:
+        status = "no_solution";
+    elif is_valid_solution(solution, sudoku, k):
+        status = "solved";
+    else:
+        status = "incorrect";
+    return {"status": status, "seconds": seconds, "timings": stats.get("timings", {}), "counters": stats.counters()};
+
+### Run a solver once in a child process, and stop it after timeout seconds
+### (the child starts as a copy of this process, so per-process caches such as sessions start in the same state)
+def timed_run_in_child(solver, sudoku, k, timeout):
+    receiver, sender = multiprocessing.Pipe(duplex=False);
+    process = multiprocessing.Process(target=child_run, args=(solver, sudoku, k, sender), daemon=True);
+    process.start();
+    sender.close();
+    if receiver.poll(timeout):
+        result = receiver.recv();
+    else:
+        result = {"status": "timeout", "seconds": timeout, "timings": {}, "counters": {}};
+    process.terminate();
+    process.join();
+    receiver.close();
+    return result;
+
+def child_run(solver, sudoku, k, sender):
+    sender.send(timed_run(solver, sudoku, k));
+    sender.close();
+
+### Median time (total and per phase) and the statuses, per solver and size
+def summarize(results):
+    groups = {};
+    for result in results:
+        groups.setdefault((result["solver"], result["k"]), []).append(result);
+    summary = [];
+    for (solver, k), group in sorted(groups.items()):
+        statuses = {};
+        for result in group:
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1;
+        phases = sorted(set(phase for result in group for phase in result["timings"]));
+        summary.append({
+            "solver": solver,
+            "k": k,
+            "runs": len(group),
+            "statuses": statuses,
+            "median_seconds": statistics.median(result["seconds"] for result in group),
+            "median_timings": {phase: statistics.median(result["timings"].get(phase, 0.0) for result in group) for phase in phases},
+        });
+    return summary;
+
+if __name__ == "__main__":
+    main();
@@ -0,0 +1,240 @@
+#!python
+
+import os
+import time
+import math
+import hashlib
+import sqlite3
+import itertools
+from functools import lru_cache
+
+from sudoku_core import is_valid_solution
+
+### On-disk cache of solutions, shared by sudoku's that are the same up to symmetry
+#
+# Sudoku's that only differ by relabeling the values, permuting rows within a band, permuting bands,
+# permuting columns within a stack, permuting stacks or transposing have the same solutions (transformed the same way).
+# A sudoku is therefore looked up by a hash of its canonical form (see canonical_form), and its solution is stored
+# in canonical form as well; a hit is transformed back to the orientation and labels of the sudoku,
+# and checked before it is returned, so a cache can never return a wrong solution.
+# Only solutions are cached: None can also mean that a solver gave up (e.g. on its time limit).
+# The store is an sqlite database, of which the least recently used entries are removed beyond max_entries.
+
+DEFAULT_MAX_ENTRIES = 100000;
+CANONICAL_CANDIDATES = 512;
+
+###
+### Canonical form
+###
+
+### The canonical form of a sudoku, and the transform that maps the sudoku to it
+# The transform is (transpose, rows, cols, labels): the canonical sudoku has labels[value] in row i and column j,
+# where value is in row rows[i] and column cols[j] of the sudoku (after transposing it, if transpose).
+# Rows are ordered by properties that symmetries keep (see line_orders), and values are relabeled in order of
+# their first occurrence; among all orders that the properties do not decide (up to max_candidates of them),
+# the smallest result is the canonical form. If there are more, one of them is used:
+# the result is then still a valid transform of the sudoku, but an equivalent sudoku might get another form.
+def canonical_form(sudoku, k, max_candidates=CANONICAL_CANDIDATES):
+    best = None;
+    for transpose in [False, True]:
+        grid = transposed(sudoku) if transpose else sudoku;
+        row_orders = line_orders(grid, k, max_candidates);
+        col_orders = line_orders(transposed(grid), k, max_candidates);
+        if len(row_orders) * len(col_orders) > max_candidates:
+            row_orders, col_orders = row_orders[:1], col_orders[:1];
+        for rows in row_orders:
+            for cols in col_orders:
+                labels = first_occurrence_labels(grid, rows, cols, k);
+                candidate = tuple(labels[grid[rowInd][colInd]] for rowInd in rows for colInd in cols);
+                if best == None or candidate < best[0]:
+                    best = (candidate, (transpose, rows, cols, labels));
+    n = k*k;
+    canonical = [list(best[0][rowInd*n:(rowInd+1)*n]) for rowInd in range(n)];
+    return canonical, best[1];
+
+### The orders of the rows of a grid that put the bands, and the rows within each band, in order of their key:
+### a row's key is its number of filled in cells, the sorted numbers per stack, and for its filled in cells the sorted
+### numbers of filled in cells in their column and of occurrences of their value; a band's key is the sorted keys of its rows
+### (keys stay the same when the columns are permuted or values relabeled; rows with the same key can go in either order,
+### so all those orders are returned, or only the first if there are more than limit)
+def line_orders(grid, k, limit):
+    n = k*k;
+    col_counts = [sum(1 for row in grid if row[colInd] != 0) for colInd in range(n)];
+    occurrences = [0] * (n+1);
+    for row in grid:
+        for value in row:
+            occurrences[value] += 1;
+    row_keys = [];
+    for row in grid:
+        per_stack = sorted(sum(1 for value in row[stack*k:(stack+1)*k] if value != 0) for stack in range(k));
+        filled = [colInd for colInd in range(n) if row[colInd] != 0];
+        row_keys.append((sum(per_stack), tuple(per_stack), tuple(sorted(col_counts[colInd] for colInd in filled)), tuple(sorted(occurrences[row[colInd]] for colInd in filled))));
+    band_keys = [tuple(sorted(row_keys[band*k:(band+1)*k])) for band in range(k)];
+    band_groups = tied_groups(range(k), band_keys);
+    row_groups = [tied_groups(range(band*k, (band+1)*k), row_keys) for band in range(k)];
+
+    count = 1;
+    for groups in [band_groups] + row_groups:
+        for group in groups:
+            count *= math.factorial(len(group));
+    if count > limit:
+        return [[rowInd for group in band_groups for band in group for rowGroup in row_groups[band] for rowInd in rowGroup]];
+
+    orders = [];
+    for bands in itertools.product(*[itertools.permutations(group) for group in band_groups]):
+        bands = [band for group in bands for band in group];
+        within = [itertools.product(*[itertools.permutations(group) for group in row_groups[band]]) for band in bands];
+        for rows in itertools.product(*within):
+            orders.append([rowInd for band in rows for group in band for rowInd in group]);
+    return orders;
+
+### Sort items by their key, and split them into groups with the same key
+def tied_groups(items, keys):
+    groups = [];
+    for key, group in itertools.groupby(sorted(items, key=lambda item: keys[item]), key=lambda item: keys[item]):
+        groups.append(list(group));
+    return groups;
+
+### Relabeling of the values, in order of their first occurrence (row by row, in the given order of rows and columns)
+### values that do not occur get the remaining labels, in increasing order
+def first_occurrence_labels(grid, rows, cols, k):
+    n = k*k;
+    labels = [0] * (n+1);
+    next_label = 1;
+    for rowInd in rows:
+        row = grid[rowInd];
+        for colInd in cols:
+            value = row[colInd];
+            if value != 0 and labels[value] == 0:
+                labels[value] = next_label;
+                next_label += 1;
+    for value in range(1, n+1):
+        if labels[value] == 0:
+            labels[value] = next_label;
+            next_label += 1;
+    return labels;
+
+def transposed(grid):
+    return [list(row) for row in zip(*grid)];
+
+### Map a grid (a sudoku or its solution) to canonical form, with the transform of canonical_form
+def to_canonical(grid, transform):
+    transpose, rows, cols, labels = transform;
+    if transpose:
+        grid = transposed(grid);
+    return [[labels[grid[rowInd][colInd]] for colInd in cols] for rowInd in rows];
+
+### Map a grid in canonical form back, with the transform of canonical_form (the inverse of to_canonical)
+def from_canonical(grid, transform):
+    transpose, rows, cols, labels = transform;
+    values = [0] * len(labels);
+    for value, label in enumerate(labels):
+        values[label] = value;
+    original = [[0] * len(cols) for rowInd in rows];
+    for rowInd, row in zip(rows, grid):
+        for colInd, label in zip(cols, row):
+            original[rowInd][colInd] = values[label];
+    return transposed(original) if transpose else original;
+
+def canonical_key(canonical, k):
+    return hashlib.sha256((str(k) + ":" + " ".join(str(value) for row in canonical for value in row)).encode()).hexdigest();
+
+###
+### Store
+###
+
+class SudokuCache(object):
+    '''
+    Solutions in an sqlite database at path, by the hash of the canonical form of their sudoku.
+
+    get() returns the solution of a sudoku (or None on a miss), put() stores one, and solve() does both around a solver,
+    e.g. cache.solve(solve_sudoku_SAT, sudoku, k, amo="sequential").
+    Every entry has the time it was last used; beyond max_entries, the least recently used ones are removed.
+    Several processes can use the same database (sqlite locks it while writing).
+    '''
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, max_candidates=CANONICAL_CANDIDATES):
+        self.path = path;
+        self.max_entries = max_entries;
+        self.max_candidates = max_candidates;
+        self.connection = sqlite3.connect(path, timeout=60);
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, k INTEGER, solution TEXT, used REAL)");
+            self.connection.execute("CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)");
+        self.hits = 0;
+        self.misses = 0;
+
+    ### The solution of sudoku, in its own orientation and labels, or None if it is not in the cache
+    def get(self, sudoku, k):
+        canonical, transform = canonical_form(sudoku, k, self.max_candidates);
+        key = canonical_key(canonical, k);
+        row = self.connection.execute("SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone();
+        solution = None;
+        if row != None:
+            solution = from_canonical(decode_grid(row[0], k), transform);
+            if is_valid_solution(solution, sudoku, k):
+                with self.connection:
+                    self.connection.execute("UPDATE solutions SET used = ? WHERE key = ?", (time.time(), key));
+            else:
+                # Cannot happen for entries written by put(), but the file may come from elsewhere
+                solution = None;
+        if solution == None:
+            self.misses += 1;
+        else:
+            self.hits += 1;
+        return solution;
+
+    ### Store the solution of sudoku (None, i.e. no solution found, is not stored)
+    def put(self, sudoku, k, solution):
+        if solution == None:
+            return;
+        canonical, transform = canonical_form(sudoku, k, self.max_candidates);
+        key = canonical_key(canonical, k);
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO solutions (key, k, solution, used) VALUES (?, ?, ?, ?)",
+                                    (key, k, encode_grid(to_canonical(solution, transform)), time.time()));
+            self.evict();
+
+    ### Remove the least recently used entries beyond max_entries
+    def evict(self):
+        count = self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0];
+        if count > self.max_entries:
+            self.connection.execute("DELETE FROM solutions WHERE key IN (SELECT key FROM solutions ORDER BY used LIMIT ?)", (count - self.max_entries,));
+
+    ### Look up the solution of sudoku, or solve it with solver(sudoku, k, *args, **kwargs) and store the solution
+    def solve(self, solver, sudoku, k, *args, **kwargs):
+        solution = self.get(sudoku, k);
+        if solution == None:
+            solution = solver([row[:] for row in sudoku], k, *args, **kwargs);
+            self.put(sudoku, k, solution);
+        return solution;
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0];
+
+    def close(self):
+        self.connection.close();
+
+    def __enter__(self):
+        return self;
+
+    def __exit__(self, *_):
+        self.close();
+
+### A solver with the cache in front of it: takes the same arguments as solver
+def cached_solver(solver, cache):
+    def solve(sudoku, k, *args, **kwargs):
+        return cache.solve(solver, sudoku, k, *args, **kwargs);
+    return solve;
+
+### One cache per path and process (e.g. per worker in batch mode)
+@lru_cache(maxsize=None)
+def sudoku_cache(path, max_entries=DEFAULT_MAX_ENTRIES):
+    return SudokuCache(os.path.abspath(path), max_entries);
+
+def encode_grid(grid):
+    return " ".join(str(value) for row in grid for value in row);
+
+def decode_grid(text, k):
+    n = k*k;
+    values = list(map(int, text.split()));
+    return [values[rowInd*n:(rowInd+1)*n] for rowInd in range(n)];
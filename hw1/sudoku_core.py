@@ -1,159 +1,1015 @@
+import math
 from copy import deepcopy
+from collections import namedtuple, deque
+from functools import lru_cache
+from itertools import count, islice
+from contextlib import contextmanager
+import time
+
+###
+### Peer/unit index, shared by the propagation code, the checks and the encodings
+###
+
+## Approach:
+## cells are numbered row by row (cell = rowInd*k*k + colInd)
+## units are numbered rows first (0..k*k-1), then columns (k*k..2*k*k-1), then boxes (2*k*k..3*k*k-1)
+## - units[unit] contains the cells of a unit
+## - cell_units[cell] contains the (row, col, box) units of a cell
+## - peers[cell] contains every other cell that shares a unit with the cell (each only once)
+## the table only depends on k, so it is built once per board size and cached
+
+PeerTable = namedtuple("PeerTable", ["k", "units", "cell_units", "peers"])
+
+@lru_cache(maxsize=None)
+def peer_table(k):
+    n = k*k
+    rows = [tuple(rowInd*n + colInd for colInd in range(n)) for rowInd in range(n)]
+    cols = [tuple(rowInd*n + colInd for rowInd in range(n)) for colInd in range(n)]
+    boxes = []
+    for rowStart in range(0,n,k):
+        for colStart in range(0,n,k):
+            boxes.append(tuple(rowInd*n + colInd for rowInd in range(rowStart, rowStart+k) for colInd in range(colStart, colStart+k)))
+    units = tuple(rows + cols + boxes)
+
+    cell_units = []
+    peers = []
+    for cell in range(n*n):
+        rowInd, colInd = divmod(cell, n)
+        box = (rowInd // k)*k + colInd // k
+        cell_units.append((rowInd, n + colInd, 2*n + box))
+        cell_peers = set(rows[rowInd]) | set(cols[colInd]) | set(boxes[box])
+        cell_peers.discard(cell)
+        peers.append(tuple(sorted(cell_peers)))
+
+    return PeerTable(k, units, tuple(cell_units), tuple(peers))
+
+def is_valid_solution(solution, sudoku, k):
+    ### checks that solution is a filled in sudoku (each unit has all values) that keeps the input values of sudoku
+    n = k*k
+    if solution is None or len(solution) != n or any(len(row) != n for row in solution):
+        return False
+    for rowInd in range(n):
+        for colInd in range(n):
+            if sudoku[rowInd][colInd] != 0 and solution[rowInd][colInd] != sudoku[rowInd][colInd]:
+                return False
+    all_values = set(range(1, n+1))
+    for unit in peer_table(k).units:
+        if set(solution[cell // n][cell % n] for cell in unit) != all_values:
+            return False
+    return True
+
+###
+### Timing of the phases of the solvers
+###
+
+## the solvers take an optional stats dict, in which timed_phase() adds up the seconds spent per phase
+## under stats["timings"]: encode (building the encoding), ground (clingo), solve and decode
+## with a SolverStats as stats, its hooks are called at the start and end of each phase
+@contextmanager
+def timed_phase(stats, phase):
+    if stats is None:
+        yield
+        return
+    call_hooks = getattr(stats, "call_hooks", None)
+    if call_hooks is not None:
+        call_hooks("start", phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = stats.setdefault("timings", {})
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+        if call_hooks is not None:
+            call_hooks("end", phase)
+
+class SolverStats(dict):
+    '''
+    The statistics of solver runs: a dict, which the solvers fill like a plain stats dict, with hooks.
+
+    Besides the timings (see timed_phase) each backend adds its own counters:
+    - prop: propagations, removals, per rule the values it removed, nodes and backtracks
+    - dlx: nodes (rows tried) and backtracks
+    - sat: variables, clauses, and the conflicts, decisions, propagations and restarts of the SAT solver
+    - asp: the rules and atoms of the ground program, and the choices and conflicts of clingo
+    - csp: the conflicts, branches and wall time of CP-SAT, and its response_stats (as text)
+    - ilp: variables, constraints, and the nodes, iterations and runtime of the MIP solver
+
+    Each hook is called as hook(event, phase, stats), with event "start" or "end",
+    at the boundaries of the phases (encode, ground, solve and decode), e.g. to profile a phase (see PhaseProfiler).
+    '''
+    def __init__(self, hooks=()):
+        dict.__init__(self)
+        self.hooks = list(hooks)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def call_hooks(self, event, phase):
+        for hook in self.hooks:
+            hook(event, phase, self)
+
+    def counters(self):
+        ### the numeric statistics (everything except the timings and texts)
+        return {key: value for key, value in self.items() if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+class PhaseProfiler(object):
+    '''
+    A hook for SolverStats that profiles the phases with cProfile: profiles[phase] is the cProfile.Profile of a phase
+    (e.g. pstats.Stats(profiler.profiles["solve"]).sort_stats("cumulative").print_stats(10)).
+    '''
+    def __init__(self, phases=("encode", "ground", "solve", "decode")):
+        self.phases = phases
+        self.profiles = {}
+
+    def __call__(self, event, phase, stats):
+        import cProfile
+        if phase not in self.phases:
+            return
+        if event == "start":
+            self.profiles.setdefault(phase, cProfile.Profile()).enable()
+        else:
+            self.profiles[phase].disable()
 
 ###
 ### Propagation function to be used in the recursive sudoku solver
 ###
 
-def propagate(sudoku_possible_values, k):
-    ###Approach: 
-    # simply removing values that are solved/guessed from the other's domains in row, col and box
-    # looping in straight order through the sudoku first, then in reverse (cause we don't look back if there is a cell with single value after removing for a cell)
-    # note: instead of reversing it could be more efficient if we checked all cells after a removal
-    # however, the solution is still quite efficient without these, and the code would be more complex
+def propagate(sudoku_possible_values, k, queue=None, stats=None, rules=()):
+    ###Approach:
+    # removing values that are solved/guessed from the other's domains in row, col and box (the peers of the cell)
+    # this is done with an event queue (in the style of AC-3): the queue holds the cells that have a single value,
+    # and when a removal leaves a peer with a single value, that peer is added to the queue as well
+    # so only cells that changed are revisited, and we stop at a fixpoint (or as soon as a cell has no values left)
+    # by default all solved/guessed cells are queued; the search can pass only the cell(s) it just changed
+    # if a dict is given as stats, the number of processed cells and removed values are added to it
+    # with rules (a subset of PROPAGATION_RULES: hidden singles, naked/hidden pairs, box-line reduction),
+    # the stronger propagation of SudokuDomains is used instead, and the result is written back into the lists
+    # returns the lists, or None if a contradiction was found (like SudokuDomains.failed; with rules the lists are left as they were)
 
-    for rowInd in range(k*k):
-        for colInd in range(k*k):
-            ### checking for solved/guessed cell (number of possible values is 1)
-            if len(sudoku_possible_values[rowInd][colInd]) == 1:
-                to_remove = sudoku_possible_values[rowInd][colInd][0]
-                #removing from row, col and box values
-                sudoku_possible_values = remove_value(sudoku_possible_values, rowInd, colInd, to_remove, k)
-    
-    ## doing the same in reverse order
-    for rowInd in reversed(range(k*k)):
-        for colInd in reversed(range(k*k)):
-            ### checking for solved/guessed cell (number of possible values is 1)
-            if len(sudoku_possible_values[rowInd][colInd]) == 1:
-                to_remove = sudoku_possible_values[rowInd][colInd][0]
-                #removing from row, col and box values
-                sudoku_possible_values = remove_value(sudoku_possible_values, rowInd, colInd, to_remove, k)
+    if rules:
+        domains = [values_to_mask(possibilities) for row in sudoku_possible_values for possibilities in row]
+        if not SudokuDomains(domains, k, rules).propagate(queue, stats):
+            return None
+        for cell, mask in enumerate(domains):
+            sudoku_possible_values[cell // (k*k)][cell % (k*k)] = mask_to_values(mask)
+        return sudoku_possible_values
 
-    return sudoku_possible_values
+    if queue is None:
+        queue = [cell for cell in range(k**4) if len(sudoku_possible_values[cell // (k*k)][cell % (k*k)]) == 1]
+    queue = deque(queue)
+    peers = peer_table(k).peers
+    processed = 0
+    removals = 0
+    contradiction = False
 
-def remove_value(sudoku_possible_values, rowInd, colInd, to_remove, k):
-    ### removing values that are already solved or guessed (=their possible values has only 1 option)
-    ## note: skipping cells that's value is under removal, trying to remove in the other cells and catching if value is not present
-    #removing from row
-    for colInd_other in range(k*k):
-        if colInd_other != colInd:
-            try:
-                sudoku_possible_values[rowInd][colInd_other].remove(to_remove)
-            except ValueError:
-                pass
-    ## removing from column
-    for rowInd_other in range(k*k):
-        if rowInd_other != rowInd:
-            try:
-                sudoku_possible_values[rowInd_other][colInd].remove(to_remove)
-            except ValueError:
-                pass
-    
-    ##removing from box
-    start_row = rowInd - (rowInd % k)
-    start_col = colInd - (colInd % k)
-    for colInd_other in range(start_col, start_col+k):
-        for rowInd_other in range(start_row, start_row+k):
-            if not (colInd_other == colInd and rowInd_other == rowInd):
-                try:
-                    sudoku_possible_values[rowInd_other][colInd_other].remove(to_remove)
-                except ValueError:
-                    pass
+    while queue:
+        cell = queue.popleft()
+        processed += 1
+        possibilities = sudoku_possible_values[cell // (k*k)][cell % (k*k)]
+        ## the cell might have lost its last value after it was queued
+        if len(possibilities) != 1:
+            continue
+        to_remove = possibilities[0]
+        for peer in peers[cell]:
+            peer_possibilities = sudoku_possible_values[peer // (k*k)][peer % (k*k)]
+            if to_remove in peer_possibilities:
+                peer_possibilities.remove(to_remove)
+                removals += 1
+                if len(peer_possibilities) == 1:
+                    queue.append(peer)
+                elif len(peer_possibilities) == 0:
+                    contradiction = True
+        ## no need to propagate any further
+        if contradiction:
+            break
 
+    if stats is not None:
+        stats["propagations"] = stats.get("propagations", 0) + processed
+        stats["removals"] = stats.get("removals", 0) + removals
+    if contradiction:
+        return None
     return sudoku_possible_values
 
 ###
-### Solver that uses SAT encoding
+### Bitmask domains (optional alternative for sudoku_possible_values)
 ###
-def solve_sudoku_SAT(sudoku,k):
 
-    ### note: this solution assumes that we don't go over 2 digits in the size/numbers (so works up to 9*9 units)
+## Approach:
+## the possible values of a cell are stored in a single int, where bit (v-1) is set iff value v is still possible
+## the whole sudoku is a flat list of k^4 of these masks (cell index = rowInd*k*k + colInd)
+## removing a value, checking for a single remaining value and counting the values are then bit operations,
+## instead of list scans and catching ValueErrors
+
+## int.bit_count() is only available from python 3.10 on
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    def popcount(mask):
+        return bin(mask).count("1")
+
+def values_to_mask(values):
+    mask = 0
+    for value in values:
+        mask |= 1 << (value-1)
+    return mask
+
+def mask_to_values(mask):
+    values = []
+    while mask:
+        lowest_bit = mask & -mask
+        values.append(lowest_bit.bit_length())
+        mask ^= lowest_bit
+    return values
+
+def is_singleton(mask):
+    ## exactly one bit set: clearing the lowest bit leaves nothing
+    return mask != 0 and mask & (mask-1) == 0
+
+def singleton_value(mask):
+    ## only meaningful if is_singleton(mask)
+    return mask.bit_length()
+
+def sudoku_to_bitmask(sudoku, k):
+    ## empty cells (0) can take all k*k values, filled in cells only their own value
+    full_mask = (1 << (k*k)) - 1
+    domains = []
+    for row in sudoku:
+        for element in row:
+            if element == 0:
+                domains.append(full_mask)
+            else:
+                domains.append(1 << (element-1))
+    return domains
+
+def bitmask_to_sudoku(domains, k):
+    ## returns None if some cell does not have exactly one possible value left
+    solved_sudoku = []
+    for rowInd in range(k*k):
+        row = []
+        for mask in domains[rowInd*k*k:(rowInd+1)*k*k]:
+            if not is_singleton(mask):
+                return None
+            row.append(singleton_value(mask))
+        solved_sudoku.append(row)
+    return solved_sudoku
+
+def propagate_bitmask(domains, k, queue=None, stats=None, rules=()):
+    ### same approach as propagate(), but on a flat list of bitmasks (see SudokuDomains.propagate())
+    SudokuDomains(domains, k, rules).propagate(queue, stats)
+    return domains
+
+## the extra inference rules that SudokuDomains.propagate() can apply (see the rule_* methods)
+PROPAGATION_RULES = ("hidden_singles", "naked_pairs", "hidden_pairs", "box_line")
+
+class SudokuDomains(object):
+    '''
+    Bitmask domains of a sudoku that are changed in place during the search.
+
+    Every change of a domain is recorded on a trail (as the cell and its old mask),
+    so the search can undo all changes back to an earlier checkpoint
+    instead of copying all domains for every value it tries.
+
+    The state also keeps track of contradictions incrementally:
+    support[unit*k*k + (v-1)] counts the cells of a unit that can still take value v,
+    and failed is set as soon as a domain becomes empty or a value has no cell left in some unit.
+    (Two cells in the same unit with the same single value need no separate check:
+    propagation removes the value from one of them, which leaves it empty.)
+
+    For choosing the cell to branch on, cells are kept in buckets by the size of their domain
+    (buckets[size] is the set of cells with size possible values).
+
+    Besides removing single values from peers, propagation can apply the rules
+    in PROPAGATION_RULES (any subset, given as rules).
+    '''
+    def __init__(self, domains, k, rules=()):
+        self.k = k
+        self.domains = domains
+        table = peer_table(k)
+        self.units = table.units
+        self.peers = table.peers
+        self.cell_units = table.cell_units
+        self.trail = []
+        for rule in rules:
+            if rule not in PROPAGATION_RULES:
+                raise ValueError("Unknown propagation rule: " + str(rule))
+        self.rules = tuple(rule for rule in PROPAGATION_RULES if rule in rules)
+
+        n = k*k
+        self.support = [0] * (3*n*n)
+        for cell, mask in enumerate(domains):
+            for value in mask_to_values(mask):
+                for unit in self.cell_units[cell]:
+                    self.support[unit*n + value-1] += 1
+        self.failed = 0 in domains or 0 in self.support
+        ## (unit, value) support indices that dropped to 1, for the hidden singles rule
+        self.track_singles = "hidden_singles" in self.rules
+        self.singles = [ind for ind, count in enumerate(self.support) if count == 1] if self.track_singles else []
+
+        self.buckets = [set() for size in range(n+1)]
+        for cell, mask in enumerate(domains):
+            self.buckets[popcount(mask)].add(cell)
+
+    def restrict(self, cell, mask):
+        ## mask should be a subset of the current domain of cell
+        old_mask = self.domains[cell]
+        self.trail.append((cell, old_mask))
+        self.domains[cell] = mask
+        if mask == 0:
+            self.failed = True
+        self.buckets[popcount(old_mask)].discard(cell)
+        self.buckets[popcount(mask)].add(cell)
+        n = self.k*self.k
+        support = self.support
+        rowUnit, colUnit, boxUnit = self.cell_units[cell]
+        removed = old_mask & ~mask
+        while removed:
+            bit = removed & -removed
+            removed ^= bit
+            value_ind = bit.bit_length() - 1
+            for ind in (rowUnit*n + value_ind, colUnit*n + value_ind, boxUnit*n + value_ind):
+                support[ind] -= 1
+                if support[ind] == 0:
+                    self.failed = True
+                elif support[ind] == 1 and self.track_singles:
+                    self.singles.append(ind)
+
+    def checkpoint(self):
+        return len(self.trail)
+
+    def undo(self, checkpoint):
+        ## checkpoints are only taken in states without contradiction, so failed can be reset
+        trail = self.trail
+        domains = self.domains
+        n = self.k*self.k
+        support = self.support
+        buckets = self.buckets
+        while len(trail) > checkpoint:
+            cell, mask = trail.pop()
+            restored = mask & ~domains[cell]
+            buckets[popcount(domains[cell])].discard(cell)
+            buckets[popcount(mask)].add(cell)
+            domains[cell] = mask
+            rowUnit, colUnit, boxUnit = self.cell_units[cell]
+            while restored:
+                bit = restored & -restored
+                restored ^= bit
+                value_ind = bit.bit_length() - 1
+                support[rowUnit*n + value_ind] += 1
+                support[colUnit*n + value_ind] += 1
+                support[boxUnit*n + value_ind] += 1
+        self.failed = False
+        del self.singles[:]
+
+    def propagate(self, queue=None, stats=None):
+        ### removing single values from the peers, with an event queue like propagate()
+        ## no exceptions or membership tests needed: a removal is a single &
+        ## when the queue is empty, the enabled rules are tried (in the order of PROPAGATION_RULES, cheapest first);
+        ## as soon as a rule removes something, we go back to the queue, until nothing changes anymore
+        ## per rule, the number of removed values is added to stats (e.g. stats["naked_pairs"])
+        ## returns False if a contradiction was found (see failed)
+        domains = self.domains
+        peers = self.peers
+        if queue is None:
+            queue = [cell for cell in range(self.k**4) if is_singleton(domains[cell])]
+        queue = deque(queue)
+        processed = 0
+        removals = 0
+        rule_removals = dict((rule, 0) for rule in self.rules)
+
+        while not self.failed:
+            while queue and not self.failed:
+                cell = queue.popleft()
+                processed += 1
+                mask = domains[cell]
+                for peer in peers[cell]:
+                    peer_mask = domains[peer]
+                    if peer_mask & mask:
+                        peer_mask &= ~mask
+                        self.restrict(peer, peer_mask)
+                        removals += 1
+                        if peer_mask and peer_mask & (peer_mask-1) == 0:
+                            queue.append(peer)
+            if self.failed:
+                break
+            for rule in self.rules:
+                removed = getattr(self, "rule_" + rule)(queue)
+                if removed:
+                    rule_removals[rule] += removed
+                    break
+            else:
+                break
+
+        if stats is not None:
+            stats["propagations"] = stats.get("propagations", 0) + processed
+            stats["removals"] = stats.get("removals", 0) + removals
+            for rule in self.rules:
+                stats[rule] = stats.get(rule, 0) + rule_removals[rule]
+        return not self.failed
+
+    def remove_values(self, cell, mask, queue):
+        ### removing the values in mask from cell (queueing it if a single value is left)
+        ## returns the number of values removed
+        old_mask = self.domains[cell]
+        removed = old_mask & mask
+        if not removed:
+            return 0
+        new_mask = old_mask & ~mask
+        self.restrict(cell, new_mask)
+        if new_mask and new_mask & (new_mask-1) == 0:
+            queue.append(cell)
+        return popcount(removed)
+
+    def unit_value_cells(self, unit, bit):
+        return [cell for cell in self.units[unit] if self.domains[cell] & bit]
+
+    def rule_hidden_singles(self, queue):
+        ### a value that fits in only one cell of a unit must go in that cell
+        ## the candidates are the (unit, value) supports that dropped to 1 (tracked in restrict())
+        n = self.k*self.k
+        removed = 0
+        while self.singles and not self.failed:
+            ind = self.singles.pop()
+            if self.support[ind] != 1:
+                continue
+            unit, value_ind = divmod(ind, n)
+            bit = 1 << value_ind
+            for cell in self.units[unit]:
+                if self.domains[cell] & bit:
+                    removed += self.remove_values(cell, ~bit, queue)
+                    break
+        return removed
+
+    def rule_naked_pairs(self, queue):
+        ### two cells in a unit with the same two possible values: these values can go nowhere else in the unit
+        ## (three or more cells with the same two values in a unit is a contradiction)
+        removed = 0
+        ## for k=1 no domain has two values (and there is no bucket for them)
+        if len(self.buckets) <= 2:
+            return removed
+        pairs = {}
+        for cell in self.buckets[2]:
+            for unit in self.cell_units[cell]:
+                pairs.setdefault((unit, self.domains[cell]), []).append(cell)
+        for (unit, mask), cells in pairs.items():
+            if len(cells) > 2:
+                self.failed = True
+                return removed
+            if len(cells) == 2:
+                for cell in self.units[unit]:
+                    if cell not in cells:
+                        removed += self.remove_values(cell, mask, queue)
+        return removed
+
+    def rule_hidden_pairs(self, queue):
+        ### two values that fit only in the same two cells of a unit: these cells can't take other values
+        n = self.k*self.k
+        removed = 0
+        for unit in range(3*n):
+            positions = {}
+            for value_ind in range(n):
+                if self.support[unit*n + value_ind] == 2:
+                    cells = tuple(self.unit_value_cells(unit, 1 << value_ind))
+                    positions[cells] = positions.get(cells, 0) | (1 << value_ind)
+            for cells, mask in positions.items():
+                if popcount(mask) == 2:
+                    for cell in cells:
+                        removed += self.remove_values(cell, ~mask, queue)
+        return removed
+
+    def rule_box_line(self, queue):
+        ### pointing: if a value fits in a box only in one row (or column), it can go nowhere else in that row (column)
+        ### claiming: if a value fits in a row (or column) only in one box, it can go nowhere else in that box
+        n = self.k*self.k
+        removed = 0
+        for unit in range(3*n):
+            for value_ind in range(n):
+                if not 2 <= self.support[unit*n + value_ind] <= self.k:
+                    continue
+                bit = 1 << value_ind
+                cells = self.unit_value_cells(unit, bit)
+                ## the other kinds of units that all of the cells share
+                for kind in range(3):
+                    other_unit = self.cell_units[cells[0]][kind]
+                    if other_unit == unit or any(self.cell_units[cell][kind] != other_unit for cell in cells):
+                        continue
+                    for cell in self.units[other_unit]:
+                        if cell not in cells:
+                            removed += self.remove_values(cell, bit, queue)
+        return removed
+
+    def unresolved_peers(self, cell):
+        return sum(1 for peer in self.peers[cell] if self.domains[peer] & (self.domains[peer]-1))
+
+    def find_uncertain_cell(self, branching="mrv"):
+        ### choosing the cell to branch on
+        ## - first: the first cell (row by row) with more than one possible value
+        ## - mrv: a cell with the minimum number of remaining values (found via the buckets, no scan over all cells)
+        ## - mrv-degree: among the mrv cells, the one with the most unresolved peers
+        ## returns None if all cells have a single value
+        if branching == "first":
+            for cell, mask in enumerate(self.domains):
+                if mask & (mask-1):
+                    return cell
+            return None
+        for size in range(2, self.k*self.k+1):
+            bucket = self.buckets[size]
+            if bucket:
+                if branching == "mrv-degree" and len(bucket) > 1:
+                    return max(sorted(bucket), key=self.unresolved_peers)
+                return min(bucket)
+        return None
+
+    def order_values(self, cell, value_order="natural"):
+        ### the values (as single bit masks) of cell, in the order in which the search should try them
+        ## - natural: smallest value first
+        ## - lcv: least constraining value first, i.e. the value that can be removed from the fewest peers
+        value_bits = [1 << (value-1) for value in mask_to_values(self.domains[cell])]
+        if value_order == "lcv":
+            peer_masks = [self.domains[peer] for peer in self.peers[cell]]
+            value_bits.sort(key=lambda bit: sum(1 for peer_mask in peer_masks if peer_mask & bit))
+        return value_bits
+
+    def search(self, stats=None, branching="mrv", value_order="natural"):
+        ### backtracking search with propagation, on the domains in place
+        ## returns True if a solution is found (self.domains then holds it), False otherwise
+        solutions = self.solutions(stats, branching, value_order)
+        found = next(solutions, None) is not None
+        solutions.close()
+        return found
+
+    def solutions(self, stats=None, branching="mrv", value_order="natural"):
+        ### generator version of search(): yields self.domains for every solution, and continues the search
+        ## after each one (the propagation rules only remove values that are in no solution, so none is missed)
+        ## instead of recursion, an explicit stack holds per guessed cell:
+        ## the values to try (in order), the index of the next one, and the checkpoint from before the guess
+        ## (so deep searches, e.g. on empty k=6 sudoku's, cannot hit python's recursion limit)
+        ## for branching and value_order see find_uncertain_cell() and order_values()
+        nodes = 0
+        backtracks = 0
+        try:
+            if not self.propagate(None, stats):
+                return
+            stack = []
+            while True:
+                cell = self.find_uncertain_cell(branching)
+                if cell is None:
+                    yield self.domains
+                else:
+                    stack.append([cell, self.order_values(cell, value_order), 0, self.checkpoint()])
+                ## trying values until one propagates without contradiction (backtracking when a cell runs out)
+                ## after a solution, this continues with the next value of the last guess
+                while stack:
+                    frame = stack[-1]
+                    cell, value_bits, index, checkpoint = frame
+                    self.undo(checkpoint)
+                    if index == len(value_bits):
+                        stack.pop()
+                        continue
+                    frame[2] = index + 1
+                    nodes += 1
+                    self.restrict(cell, value_bits[index])
+                    if self.propagate([cell], stats):
+                        break
+                    backtracks += 1
+                if not stack:
+                    return
+        finally:
+            if stats is not None:
+                stats["nodes"] = stats.get("nodes", 0) + nodes
+                stats["backtracks"] = stats.get("backtracks", 0) + backtracks
+
+def solve_sudoku_bitmask(sudoku, k, stats=None, branching="mrv", value_order="natural", rules=PROPAGATION_RULES):
+    ### solver with propagation, like solve_sudoku_prop() in sudoku.py, but on bitmask domains
+    ## the search changes one SudokuDomains in place, and undoes changes with its trail
+    ## branching is one of first/mrv/mrv-degree, value_order one of natural/lcv,
+    ## and rules a subset of PROPAGATION_RULES (see SudokuDomains)
+    with timed_phase(stats, "encode"):
+        state = SudokuDomains(sudoku_to_bitmask(sudoku, k), k, rules)
+    with timed_phase(stats, "solve"):
+        found = state.search(stats, branching, value_order)
+    if not found:
+        return None
+    with timed_phase(stats, "decode"):
+        return bitmask_to_sudoku(state.domains, k)
+
+def prop_solutions(sudoku, k, stats=None, branching="mrv", value_order="natural", rules=PROPAGATION_RULES):
+    ### yields every solution of sudoku, with the search of solve_sudoku_bitmask
+    state = SudokuDomains(sudoku_to_bitmask(sudoku, k), k, rules)
+    for domains in state.solutions(stats, branching, value_order):
+        yield bitmask_to_sudoku(domains, k)
+
+###
+### Batch solver: propagation on many sudoku's (of the same k) at once, with numpy
+###
+def solve_sudoku_batch(sudokus, k, stats=None, rules=PROPAGATION_RULES):
+    import numpy as np
+
+    ## Approach:
+    ## the possible values of all sudoku's are stored in one boolean tensor of shape (batch, k*k, k*k, k*k),
+    ## where candidates[b, rowInd, colInd, v-1] is True iff value v is still possible in that cell of sudoku b
+    ## one propagation step works on all sudoku's at once:
+    ## - peer elimination: count per row/col/box and value the cells that have it as their single value,
+    ##   a value is removed from a cell if some other cell in one of its units has it as single value
+    ## - hidden singles: a value that is possible in only one cell of a unit is the value of that cell
+    ## steps are repeated (on the sudoku's that are still changing) until nothing changes anymore
+    ## sudoku's that are then not solved and not contradictory fall back to the search of SudokuDomains
+    ## returns the solutions (or None if there is none) in the same order as the sudoku's
+
+    n = k*k
+    if len(sudokus) == 0:
+        return []
+    grids = np.array(sudokus, dtype=np.int64).reshape(-1, n, n)
+    candidates = np.where((grids > 0)[..., None], np.eye(n, dtype=bool)[grids-1], True)
+
+    def expand_boxes(box_counts):
+        ## (batch, k, k, n) per box -> (batch, n, n, n) per cell
+        return box_counts.repeat(k, axis=1).repeat(k, axis=2)
+
+    def unit_counts(values):
+        ## per cell and value: how many cells in its row, col and box have the value
+        row = values.sum(axis=2, dtype=np.int32)[:, :, None, :]
+        col = values.sum(axis=1, dtype=np.int32)[:, None, :, :]
+        box = expand_boxes(values.reshape(-1, k, k, k, k, n).sum(axis=(2, 4), dtype=np.int32))
+        return row, col, box
+
+    iterations = 0
+    active = np.arange(len(grids))
+    while len(active) > 0:
+        iterations += 1
+        current = candidates[active]
+        ## peer elimination (a single value counts 3 times for its own cell, once per unit)
+        singles = current & (current.sum(axis=3) == 1)[..., None]
+        row, col, box = unit_counts(singles)
+        updated = current & (row + col + box - 3*singles == 0)
+        ## hidden singles
+        if "hidden_singles" in rules:
+            row, col, box = unit_counts(updated)
+            hidden = updated & ((row == 1) | (col == 1) | (box == 1))
+            updated = np.where(hidden.any(axis=3)[..., None], hidden, updated)
+        changed = (updated != current).any(axis=(1, 2, 3))
+        candidates[active] = updated
+        active = active[changed]
+
+    counts = candidates.sum(axis=3)
+    contradiction = (counts == 0).any(axis=(1, 2))
+    solved = (counts == 1).all(axis=(1, 2)) & ~contradiction
+
+    ## decoding by index: argmax gives the position of the (single) True value
+    values = candidates.argmax(axis=3) + 1
+    bit_values = (1 << np.arange(n, dtype=np.int64))
+    solutions = []
+    searched = 0
+    for ind in range(len(grids)):
+        if contradiction[ind]:
+            solutions.append(None)
+        elif solved[ind]:
+            solutions.append(values[ind].tolist())
+        else:
+            ## stalled: per-sudoku search, starting from the propagated candidates
+            searched += 1
+            domains = [int(mask) for mask in (candidates[ind].reshape(n*n, n) * bit_values).sum(axis=1)]
+            state = SudokuDomains(domains, k, rules)
+            if state.search(stats):
+                solutions.append(bitmask_to_sudoku(state.domains, k))
+            else:
+                solutions.append(None)
+
+    if stats is not None:
+        stats["batch_iterations"] = stats.get("batch_iterations", 0) + iterations
+        stats["batch_solved"] = stats.get("batch_solved", 0) + int(solved.sum())
+        stats["batch_searched"] = stats.get("batch_searched", 0) + searched
+    return solutions
+
+###
+### Solver that uses SAT encoding
+###
+def solve_sudoku_SAT(sudoku,k,session=None,reduce=True,amo="pairwise",stats=None):
 
-    from pysat.formula import CNF
     from pysat.solvers import MinisatGH
 
-    ## constraint id is calculated as follows: concatenate row num, col num and value, padded two 2 digits   
+    ## variable ids are computed arithmetically (see sat_var), so this works for every k
+    ## with a session (see SATSession), the structural clauses are not encoded again
+    ## with reduce, propagation runs first, and only the values that are still possible get encoded
+    ## (see sudoku_reduced_cnf)
+    ## amo selects the encoding of the at-most-one constraints (see at_most_one)
+    ## stats gets the time per phase (see timed_phase)
+
+    if session is not None:
+        return session.solve(sudoku, stats)
+
+    if reduce:
+        with timed_phase(stats, "encode"):
+            reduced = sudoku_reduced_cnf(sudoku, k, amo=amo)
+            if reduced is None:
+                return None
+            formula, variables, domains = reduced
+            solver = MinisatGH(bootstrap_with=formula)
+        with timed_phase(stats, "solve"):
+            answer = solver.solve()
+        model = solver.get_model() if answer else None
+        record_sat_stats(stats, solver, formula.nv, len(formula.clauses))
+        solver.delete()
+        if not answer:
+            return None
+        with timed_phase(stats, "decode"):
+            return decode_reduced_model(model, variables, domains, k)
+
+    with timed_phase(stats, "encode"):
+        formula = sudoku_base_cnf(k, amo)
+        solver = MinisatGH(bootstrap_with=formula)
+
+        ## Adding the input values as literals
+        givens = 0
+        for rowInd in range(k*k):
+            for colInd in range(k*k):
+                if sudoku[rowInd][colInd] != 0:
+                    solver.add_clause([sat_var(rowInd*k*k + colInd, sudoku[rowInd][colInd], k)])
+                    givens += 1
+
+    ## calling the solver
+    with timed_phase(stats, "solve"):
+        answer = solver.solve()
+    model = solver.get_model() if answer else None
+    record_sat_stats(stats, solver, formula.nv, len(formula.clauses) + givens)
+    solver.delete()
+    if not answer:
+        return None
+    with timed_phase(stats, "decode"):
+        return decode_sat_model(model, k)
+
+def record_sat_stats(stats, solver, variables, clauses, before=None):
+    ### adds the size of the formula and the search statistics of a pysat solver to stats
+    ## (before: the accumulated statistics of the solver before this solve, for solvers that are reused)
+    if stats is None:
+        return
+    stats["variables"] = variables
+    stats["clauses"] = clauses
+    for key, value in solver.accum_stats().items():
+        stats[key] = stats.get(key, 0) + value - (before or {}).get(key, 0)
 
-    solver = MinisatGH()
+def sat_solutions(sudoku, k, amo="pairwise"):
+    ### yields every solution of sudoku, from the reduced encoding (see sudoku_reduced_cnf)
+    ## after each model, a blocking clause (not all of its true value variables) excludes it
+    from pysat.solvers import MinisatGH
+    reduced = sudoku_reduced_cnf(sudoku, k, amo=amo)
+    if reduced is None:
+        return
+    formula, variables, domains = reduced
+    solver = MinisatGH(bootstrap_with=formula)
+    try:
+        while solver.solve():
+            model = solver.get_model()
+            yield decode_reduced_model(model, variables, domains, k)
+            blocking_clause = [-lit for lit in model if 0 < lit <= len(variables)]
+            ## without open values (solved by propagation) there is only one solution
+            if not blocking_clause:
+                return
+            solver.add_clause(blocking_clause)
+    finally:
+        solver.delete()
+
+def sudoku_base_cnf(k, amo="pairwise"):
+    ### the structural clauses for sudoku's of size k (everything except the input values)
+    from pysat.formula import CNF
     formula = CNF()
-    
+
     ## Approach:
     ## We have variables for each possible value in each cell (so rowNum * colNum * potential_values = k*k * k*k * k*k)
     ## for each unit (row, co, box) we add a rule that at least one should be true (a or b or c or ...)
-    ## than for each pair in a unit, we add that the two cannot be true at the same time (not a or not b)
+    ## than for each unit, we add that no two can be true at the same time (pairwise: not a or not b, see at_most_one)
+    ## auxiliary variables of the at-most-one encodings are numbered after the k^6 value variables
+    n = k*k
+    new_var = count(n**3 + 1).__next__
 
     ## adding: one position can't take two values
-    
-    for rowInd in range(k*k):
-        for colInd in range(k*k):
-            for valOne in range(k*k-1):
-                for valTwo in range(valOne+1, k*k):
-                    formula.append([-int(pad_str(rowInd+1) + pad_str(colInd+1) + pad_str(valOne+1)), -int(pad_str(rowInd+1) + pad_str(colInd+1) + pad_str(valTwo+1))])
-    
-    ## adding: row rules
-    for rowInd in range(k*k):
-        for possible_value in range(k*k):
-            ## adding that one should be true
-            formula.append([int(pad_str(rowInd+1) + pad_str(colInd+1) + pad_str(possible_value+1)) for colInd in range(k*k)])
-            ## adding that two cannot be true
-            for colIndOne in range(k*k-1):
-                for colIndTwo in range(colIndOne+1, k*k):
-                    formula.append([-int(pad_str(rowInd+1) + pad_str(colIndOne+1) + pad_str(possible_value+1)), -int(pad_str(rowInd+1) + pad_str(colIndTwo+1) + pad_str(possible_value+1))])
-    
-    ## adding: col rules
-    for colInd in range(k*k):
-        for possible_value in range(k*k):
+    for cell in range(k**4):
+        formula.extend(at_most_one([cell*n + value for value in range(1, n+1)], amo, new_var))
+
+    ## adding: unit rules (rows, cols and boxes, see peer_table)
+    for unit in peer_table(k).units:
+        for possible_value in range(1, n+1):
+            unit_vars = [cell*n + possible_value for cell in unit]
             ## adding that one should be true
-            formula.append([int(pad_str(rowInd+1) + pad_str(colInd+1) + pad_str(possible_value+1)) for rowInd in range(k*k)])
+            formula.append(unit_vars)
             ## adding that two cannot be true
-            for rowIndOne in range(k*k-1):
-                for rowIndTwo in range(rowIndOne+1, k*k):
-                    formula.append([-int(pad_str(rowIndOne+1) + pad_str(colInd+1) + pad_str(possible_value+1)), -int(pad_str(rowIndTwo+1) + pad_str(colInd+1) + pad_str(possible_value+1))])
-    
-    ## adding: box rules
-    for rowStart in range(0,k*k,k):
-        for colStart in range(0,k*k,k):
-            ## looping inside box
-            for possible_value in range(k*k):
-
-                ## adding that one should be true
-                box_ids = []
-                for rowInd in range(rowStart, rowStart+k):
-                    for colInd in range(colStart, colStart+k):
-                        box_ids.append(int(pad_str(rowInd+1) + pad_str(colInd+1) + pad_str(possible_value+1)))
-                formula.append(box_ids)
-
-                ## adding that two cannot be true
-                for rowIndOne in range(rowStart, rowStart+k):
-                    for colIndOne in range(colStart, colStart+k):
-                        for rowIndTwo in range(rowIndOne, rowStart+k):
-                            for colIndTwo in range(colIndOne, colStart+k):
-                                if not (rowIndOne == rowIndTwo and colIndOne == colIndTwo):
-                                    formula.append([-int(pad_str(rowIndOne+1) + pad_str(colIndOne+1) + pad_str(possible_value+1)), -int(pad_str(rowIndTwo+1) + pad_str(colIndTwo+1) + pad_str(possible_value+1))])
-    
-    ## Adding the input values as literals
-    for rowInd in range(k*k):
-        for colInd in range(k*k):
-            if sudoku[rowInd][colInd] != 0:
-                formula.append([int(pad_str(rowInd+1) + pad_str(colInd+1) + pad_str(sudoku[rowInd][colInd]))])
-                
+            formula.extend(at_most_one(unit_vars, amo, new_var))
 
-    ## calling the solver
-    solver.append_formula(formula)
-    answer = solver.solve()
-    if not answer:
+    return formula
+
+## the encodings of at-most-one constraints that at_most_one() supports
+AMO_ENCODINGS = ("pairwise", "sequential", "commander", "product", "bimander")
+
+def at_most_one(lits, encoding, new_var):
+    ### clauses that allow at most one of lits to be true
+    ## new_var() should return a fresh variable id, for the encodings with auxiliary variables
+    ## - pairwise: not a or not b, for every pair (m*(m-1)/2 clauses, no auxiliary variables)
+    ## - sequential: sequential counter (Sinz, 2005), s_i means "one of the first i is true" (3m-4 clauses, m-1 variables)
+    ## - commander: groups of 3, pairwise inside a group, each group implies its commander variable,
+    ##   and at most one commander (recursively) (Klieber & Kwon, 2007)
+    ## - product: the literals on a p*q grid, each implies its row and column variable,
+    ##   and at most one row and one column (recursively) (Chen, 2010)
+    ## - bimander: groups of 2, pairwise inside a group, each literal implies the binary code of its group
+    ##   (Nguyen & Mai, 2015)
+    ## sets of up to 4 literals always use pairwise, which is the smallest for them
+    m = len(lits)
+    if m <= 1:
+        return []
+    if encoding not in AMO_ENCODINGS:
+        raise ValueError("Unknown at-most-one encoding: " + str(encoding))
+    if encoding == "pairwise" or m <= 4:
+        return [[-lits[indOne], -lits[indTwo]] for indOne in range(m-1) for indTwo in range(indOne+1, m)]
+
+    clauses = []
+    if encoding == "sequential":
+        counter = [new_var() for ind in range(m-1)]
+        clauses.append([-lits[0], counter[0]])
+        for ind in range(1, m-1):
+            clauses.append([-lits[ind], counter[ind]])
+            clauses.append([-counter[ind-1], counter[ind]])
+            clauses.append([-lits[ind], -counter[ind-1]])
+        clauses.append([-lits[m-1], -counter[m-2]])
+
+    elif encoding == "commander":
+        commanders = []
+        for start in range(0, m, 3):
+            group = lits[start:start+3]
+            if len(group) == 1:
+                commanders.append(group[0])
+                continue
+            commander = new_var()
+            commanders.append(commander)
+            clauses.extend(at_most_one(group, "pairwise", new_var))
+            clauses.extend([-lit, commander] for lit in group)
+        clauses.extend(at_most_one(commanders, "commander", new_var))
+
+    elif encoding == "product":
+        rows = int(math.ceil(math.sqrt(m)))
+        cols = int(math.ceil(m / rows))
+        row_vars = [new_var() for ind in range(rows)]
+        col_vars = [new_var() for ind in range(cols)]
+        for ind, lit in enumerate(lits):
+            rowInd, colInd = divmod(ind, cols)
+            clauses.append([-lit, row_vars[rowInd]])
+            clauses.append([-lit, col_vars[colInd]])
+        clauses.extend(at_most_one(row_vars, "product", new_var))
+        clauses.extend(at_most_one(col_vars, "product", new_var))
+
+    elif encoding == "bimander":
+        groups = [lits[start:start+2] for start in range(0, m, 2)]
+        bits = [new_var() for ind in range((len(groups)-1).bit_length())]
+        for groupInd, group in enumerate(groups):
+            clauses.extend(at_most_one(group, "pairwise", new_var))
+            for lit in group:
+                for bitInd, bit in enumerate(bits):
+                    clauses.append([-lit, bit if (groupInd >> bitInd) & 1 else -bit])
+
+    return clauses
+
+def sat_encoding_report(k, sudoku=None, encodings=AMO_ENCODINGS):
+    ### the size of the SAT encoding for each at-most-one encoding
+    ## of the structural clauses for size k, or (given a sudoku) of its reduced encoding
+    ## returns {encoding: {"variables": .., "clauses": .., "literals": ..}} (None if propagation finds a contradiction)
+    report = {}
+    for amo in encodings:
+        if sudoku is None:
+            formula = sudoku_base_cnf(k, amo)
+        else:
+            reduced = sudoku_reduced_cnf(sudoku, k, amo=amo)
+            if reduced is None:
+                report[amo] = None
+                continue
+            formula = reduced[0]
+        report[amo] = {"variables": formula.nv, "clauses": len(formula.clauses), "literals": sum(len(clause) for clause in formula.clauses)}
+    return report
+
+def sudoku_reduced_cnf(sudoku, k, rules=PROPAGATION_RULES, amo="pairwise"):
+    ### given-aware encoding: only the values that propagation leaves possible get a variable
+    ## Approach:
+    ## run the propagation of SudokuDomains first (the same as propagate() with rules)
+    ## - cells with a single value left get no variables at all,
+    ##   and neither do the (unit, value) pairs that such a cell already covers
+    ##   (propagation removed the value from all other cells in those units)
+    ## - other cells get one variable per possible value, numbered densely from 1
+    ## - at least one / at most one (see at_most_one) per open cell, and per unit and open value
+    ##   (auxiliary variables of the at-most-one encoding are numbered after the value variables)
+    ## returns None if propagation finds a contradiction, otherwise (formula, variables, domains),
+    ## where variables[var-1] is the (cell, value) of variable var
+    from pysat.formula import CNF
+    n = k*k
+    domains = sudoku_to_bitmask(sudoku, k)
+    if not SudokuDomains(domains, k, rules).propagate():
         return None
-    else:
-        ### reconstruct sudoku from solution
-        for lit in solver.get_model():
-            if lit > 0:
-                lit_split = [int(x) for x in str(lit)]
-                ## appending leading zero if needed, since int conversion removes it
-                if len(lit_split) < 6:
-                    lit_split = [0] + lit_split
-                print(lit_split)
-
-                sudoku[10*lit_split[0] + lit_split[1]-1][10 * lit_split[2] + lit_split[3] -1] = 10 * lit_split[4] + lit_split[5] 
-        return sudoku
+
+    variables = []
+    var_of = {}
+    cell_var_lists = []
+    formula = CNF()
+    for cell, mask in enumerate(domains):
+        if is_singleton(mask):
+            continue
+        cell_vars = []
+        cell_var_lists.append(cell_vars)
+        for value in mask_to_values(mask):
+            variables.append((cell, value))
+            var_of[(cell, value)] = len(variables)
+            cell_vars.append(len(variables))
+        ## adding: at least one value
+        formula.append(cell_vars)
+
+    new_var = count(len(variables) + 1).__next__
+    for cell_vars in cell_var_lists:
+        ## adding: no two values
+        formula.extend(at_most_one(cell_vars, amo, new_var))
+
+    for unit in peer_table(k).units:
+        for possible_value in range(1, n+1):
+            unit_vars = [var_of[(cell, possible_value)] for cell in unit if (cell, possible_value) in var_of]
+            if not unit_vars:
+                ## the value is placed by a cell with a single value
+                continue
+            formula.append(unit_vars)
+            formula.extend(at_most_one(unit_vars, amo, new_var))
+
+    return formula, variables, domains
+
+def decode_reduced_model(model, variables, domains, k):
+    ### reconstruct sudoku from a model of sudoku_reduced_cnf: single values from the domains, the rest from the model
+    n = k*k
+    sudoku = [[singleton_value(domains[rowInd*n + colInd]) if is_singleton(domains[rowInd*n + colInd]) else 0 for colInd in range(n)] for rowInd in range(n)]
+    for lit in model:
+        if 0 < lit <= len(variables):
+            cell, value = variables[lit-1]
+            sudoku[cell // n][cell % n] = value
+    return sudoku
+
+class SATSession(object):
+    '''
+    A persistent SAT solver for sudoku's of one size k.
+
+    The structural clauses (sudoku_base_cnf) are encoded and loaded into the solver once.
+    Each sudoku is then solved with its input values as assumptions instead of unit clauses,
+    so nothing needs to be encoded again, and the solver keeps its learned clauses between solves.
+    exclude gives (cell, value) pairs that a solution may not have, also as assumptions
+    (e.g. to look for a second solution, see sudoku_generator.py).
+    amo selects the at-most-one encoding of the structural clauses (see at_most_one).
+    '''
+    def __init__(self, k, amo="pairwise"):
+        from pysat.solvers import MinisatGH
+        self.k = k
+        formula = sudoku_base_cnf(k, amo)
+        self.variables = formula.nv
+        self.clauses = len(formula.clauses)
+        self.solver = MinisatGH(bootstrap_with=formula)
+
+    def solve(self, sudoku, stats=None, exclude=()):
+        k = self.k
+        with timed_phase(stats, "encode"):
+            assumptions = []
+            for rowInd in range(k*k):
+                for colInd in range(k*k):
+                    if sudoku[rowInd][colInd] != 0:
+                        assumptions.append(sat_var(rowInd*k*k + colInd, sudoku[rowInd][colInd], k))
+            for cell, value in exclude:
+                assumptions.append(-sat_var(cell, value, k))
+        before = self.solver.accum_stats()
+        with timed_phase(stats, "solve"):
+            answer = self.solver.solve(assumptions=assumptions)
+        record_sat_stats(stats, self.solver, self.variables, self.clauses, before)
+        if not answer:
+            return None
+        with timed_phase(stats, "decode"):
+            return decode_sat_model(self.solver.get_model(), k)
+
+    def delete(self):
+        self.solver.delete()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.delete()
+
+## one session per k, for callers that solve many sudoku's (e.g. batch mode in sudoku.py)
+_sat_sessions = {}
+
+def sat_session(k, amo="pairwise"):
+    if (k, amo) not in _sat_sessions:
+        _sat_sessions[(k, amo)] = SATSession(k, amo)
+    return _sat_sessions[(k, amo)]
+
+def sat_var(cell, value, k):
+    ## variable ids are dense: 1..k^6, cell*k*k + value (with cell numbered as in peer_table, value in 1..k*k)
+    return cell*k*k + value
+
+def decode_sat_model(model, k):
+    ### reconstruct sudoku from a model (list of literals), by inverting sat_var
+    n = k*k
+    sudoku = [[0]*n for rowInd in range(n)]
+    for lit in model:
+        if 0 < lit <= n**3:
+            cell, value_ind = divmod(lit-1, n)
+            sudoku[cell // n][cell % n] = value_ind + 1
+    return sudoku
 
 def pad_str(i):
     s = str(i)
@@ -164,221 +1020,831 @@ def pad_str(i):
 ###
 ### Solver that uses CSP encoding
 ###
-def solve_sudoku_CSP(sudoku,k):
-    from ortools.sat.python import cp_model
-    model = cp_model.CpModel()
-
+def solve_sudoku_CSP(sudoku,k,workers=None,time_limit=None,hint=None,stats=None):
     ## Approach:
-    ## variables stored in a matrix of same format as the sudoku itself
+    ## variables stored per cell (cell = rowInd*k*k + colInd, as in peer_table)
     ## each has the domain 1-k
-    ## for each pair in a unit (row, col, box) add a constraint that they cannot be equal
-    ## note: pairwise is more efficient than alldif, but for code simplicity box employs alldiff
+    ## for each unit (row, col, box) add an AllDifferent constraint
+    ## the model is built once per k (see CSPTemplate), each sudoku solves a copy of it
+    ## with the domains of the input cells fixed to their value
+    ## workers: number of parallel search workers (None: the CP-SAT default, all cores)
+    ## time_limit: in seconds (None: no limit)
+    ## hint: a (partial) grid with values to try first (0 for no hint)
+    ## returns None if there is no solution (or none is found within the time limit)
+    ## stats gets the time per phase (see timed_phase)
+    with timed_phase(stats, "encode"):
+        template = csp_template(k)
+    return template.solve(sudoku, workers=workers, time_limit=time_limit, hint=hint, stats=stats)
 
-    ## define variables matrix
-    var_matrix = [[0 for j in range(k*k)] for i in range(k*k)]
-    for rowInd in range(k*k):
-        for colInd in range(k*k):
-            var_matrix[rowInd][colInd] = model.NewIntVar(1,k*k,pad_str(rowInd+1) + pad_str(colInd+1))
+class CSPTemplate(object):
+    '''
+    The CP-SAT model of the structure of sudoku's of one size k.
 
-    ## note: pairwise non-equality constraint is a lot more efficient than alldif
-    ## adding: row rules
-    for rowInd in range(k*k):
-        for colIndOne in range(k*k-1):
-            for colIndTwo in range(colIndOne+1, k*k):
-                model.Add(var_matrix[rowInd][colIndOne]!=var_matrix[rowInd][colIndTwo])
-
-    ## adding: col rules
-    for colInd in range(k*k):
-        for rowIndOne in range(k*k-1):
-            for rowIndTwo in range(rowIndOne+1, k*k):
-                model.Add(var_matrix[rowIndOne][colInd]!=var_matrix[rowIndTwo][colInd])
-
-    ## adding: box rules
-    ## here i use alldif for simplicity
-    for rowStart in range(0,k*k,k):
-        for colStart in range(0,k*k,k):
-            box_vars = []
-            for rowInd in range(rowStart, rowStart+k):
-                for colInd in range(colStart, colStart+k):
-                    box_vars.append(var_matrix[rowInd][colInd])
-            model.AddAllDifferent(box_vars)
-
-    ## adding input values as constraints
-    for rowInd in range(k*k):
-        for colInd in range(k*k):
-            if sudoku[rowInd][colInd] != 0:
-                model.Add(var_matrix[rowInd][colInd] == sudoku[rowInd][colInd])
-    ## solving model
-    solver = cp_model.CpSolver();
-    answer = solver.Solve(model);
+    The variables and the AllDifferent constraints are built once. For each sudoku the model is cloned,
+    and the input values are set as the domains of their variables (instead of adding constraints),
+    so the model does not need to be built again.
+    '''
+    def __init__(self, k):
+        from ortools.sat.python import cp_model
+        self.k = k
+        self.model = cp_model.CpModel()
 
-    ## reconstructing sudoku
-    for rowInd in range(k*k):
-        for colInd in range(k*k):
-            sudoku[rowInd][colInd] = solver.Value(var_matrix[rowInd][colInd])
+        ## define variables, the proto index of each variable is its cell
+        cell_vars = []
+        for rowInd in range(k*k):
+            for colInd in range(k*k):
+                cell_vars.append(self.model.NewIntVar(1,k*k,pad_str(rowInd+1) + pad_str(colInd+1)))
+
+        ## adding: row, col and box rules (see peer_table)
+        for unit in peer_table(k).units:
+            self.model.AddAllDifferent([cell_vars[cell] for cell in unit])
 
-    return sudoku;
+    def instance(self, sudoku, hint=None):
+        ### a copy of the template, for the input values (and hints) of sudoku
+        k = self.k
+        model = self.model.Clone()
+        variables = model.Proto().variables
+
+        ## adding input values as the domains of their variables
+        for rowInd in range(k*k):
+            for colInd in range(k*k):
+                if sudoku[rowInd][colInd] != 0:
+                    domain = variables[rowInd*k*k + colInd].domain
+                    domain[0] = sudoku[rowInd][colInd]
+                    domain[1] = sudoku[rowInd][colInd]
+
+        ## adding hints for the open cells
+        if hint is not None:
+            for rowInd in range(k*k):
+                for colInd in range(k*k):
+                    if sudoku[rowInd][colInd] == 0 and hint[rowInd][colInd] != 0:
+                        model.AddHint(model.GetIntVarFromProtoIndex(rowInd*k*k + colInd), hint[rowInd][colInd])
+        return model
+
+    def solve(self, sudoku, workers=None, time_limit=None, hint=None, stats=None):
+        from ortools.sat.python import cp_model
+        k = self.k
+        with timed_phase(stats, "encode"):
+            model = self.instance(sudoku, hint)
+
+        ## solving model
+        solver = cp_model.CpSolver()
+        if workers is not None:
+            solver.parameters.num_workers = workers
+        if time_limit is not None:
+            solver.parameters.max_time_in_seconds = time_limit
+        with timed_phase(stats, "solve"):
+            status = solver.Solve(model)
+        if stats is not None:
+            stats["conflicts"] = stats.get("conflicts", 0) + solver.NumConflicts()
+            stats["branches"] = stats.get("branches", 0) + solver.NumBranches()
+            stats["wall_time"] = stats.get("wall_time", 0.0) + solver.WallTime()
+            stats["response_stats"] = solver.ResponseStats()
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None
+
+        ## reconstructing sudoku, the solution is indexed by cell
+        with timed_phase(stats, "decode"):
+            solution = solver.ResponseProto().solution
+            for rowInd in range(k*k):
+                for colInd in range(k*k):
+                    sudoku[rowInd][colInd] = solution[rowInd*k*k + colInd]
+
+        return sudoku
+
+    def solutions(self, sudoku):
+        ### yields every solution of sudoku, as CP-SAT finds them
+        ## the solver runs in a thread, and its solution callback hands each solution over a queue
+        ## (of size 1, so the search waits until a solution is taken), stopping the search when the caller stops
+        import queue
+        import threading
+        from ortools.sat.python import cp_model
+        k = self.k
+        model = self.instance(sudoku)
+        solutions = queue.Queue(maxsize=1)
+        stopped = threading.Event()
+
+        class SolutionCallback(cp_model.CpSolverSolutionCallback):
+            def on_solution_callback(self):
+                solution = [[self.Value(model.GetIntVarFromProtoIndex(rowInd*k*k + colInd)) for colInd in range(k*k)] for rowInd in range(k*k)]
+                while not stopped.is_set():
+                    try:
+                        solutions.put(solution, timeout=0.1)
+                        return
+                    except queue.Full:
+                        pass
+                self.StopSearch()
+
+        def search():
+            solver = cp_model.CpSolver()
+            solver.parameters.enumerate_all_solutions = True
+            try:
+                solver.Solve(model, SolutionCallback())
+            finally:
+                ## None marks the end of the search
+                while not stopped.is_set():
+                    try:
+                        solutions.put(None, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+
+        thread = threading.Thread(target=search, daemon=True)
+        thread.start()
+        try:
+            while True:
+                solution = solutions.get()
+                if solution is None:
+                    return
+                yield solution
+        finally:
+            stopped.set()
+            thread.join()
+
+## one template per k, so the model of each size is only built once
+_csp_templates = {}
+
+def csp_template(k):
+    if k not in _csp_templates:
+        _csp_templates[k] = CSPTemplate(k)
+    return _csp_templates[k]
 
 ###
 ### Solver that uses ASP encoding
 ###
-def solve_sudoku_ASP(sudoku,k):
-    import clingo
-    asp_code = ""
+## Approach:
+## the encoding is first-order, clingo grounds it for the k that is given as constant (-c k=..)
+## rows, cols and values are numbers, a cell is a (row, col) pair, and its box is computed with arithmetic once, in box/3
+## (so the box constraints join the value atoms on their box, instead of joining all pairs and comparing boxes)
+## each cell chooses exactly one value (a choice rule), the input values are given/3 facts
+## and at most one cell of each unit takes a value (pairwise, or with a cardinality bound)
+ASP_SUDOKU_PROGRAM = """
+#const n = k*k.
+pos(0..n-1).
+val(1..n).
+box(R,C,(R/k)*k + C/k) :- pos(R), pos(C).
+1 { value(R,C,V) : val(V) } 1 :- pos(R), pos(C).
+value(R,C,V) :- given(R,C,V).
+#defined given/3.
+#show value/3.
+"""
 
-    ##Approach:
-    ## each cells is defined as a cell (with name c<ROW_NUM>_<COL_NUM>)
-    ## for every pair in a unit (row, col or box) encode that they are in the same unit
-    ## encode that each cells should take exactly one of the k values
-    ## add a rule that two cells that are in the same unit cannot have the same value
+## the encodings of the at-most-one (per unit and value) constraints that solve_sudoku_ASP supports
+ASP_AMO_RULES = {
+    ## two cells that share a row, col or box cannot take the same value
+    "pairwise": """
+:- value(R,C1,V), value(R,C2,V), C1 < C2.
+:- value(R1,C,V), value(R2,C,V), R1 < R2.
+:- value(R1,C1,V), box(R1,C1,B), box(R2,C2,B), (R1,C1) < (R2,C2), value(R2,C2,V).
+""",
+    ## no row, col or box has a value twice (grounds to one aggregate per unit and value)
+    "cardinality": """
+:- pos(R), val(V), 2 { value(R,C,V) : pos(C) }.
+:- pos(C), val(V), 2 { value(R,C,V) : pos(R) }.
+:- pos(B), val(V), 2 { value(R,C,V) : box(R,C,B) }.
+""",
+}
+ASP_AMO_ENCODINGS = tuple(ASP_AMO_RULES)
 
-    ## first: encode cells
-    for rowInd in range(k*k):
-        for colInd in range(k*k):
-            cell_id = "c" + str(rowInd) + "_" + str(colInd)
-            asp_code += "cell(" + cell_id + ").\n"
-    
-    
-    ## encode cells sharing row
-    for rowInd in range(k*k):
-        for colIndOne in range(k*k-1):
-            for colIndTwo in range(colIndOne+1, k*k):
-                cellOne_id = "c" + str(rowInd)+ "_"  + str(colIndOne)
-                cellTwo_id = "c" + str(rowInd)+ "_"  + str(colIndTwo)
-                asp_code += "same_unit(" + cellOne_id + "," + cellTwo_id + ").\n"
-    
-    ## encode cells sharing col
-    for colInd in range(k*k):
-        for rowIndOne in range(k*k-1):
-            for rowIndTwo in range(rowIndOne+1,k*k):
-                cellOne_id = "c" + str(rowIndOne)+ "_"  + str(colInd) 
-                cellTwo_id = "c" + str(rowIndTwo)+ "_"  + str(colInd) 
-                asp_code += "same_unit(" + cellOne_id + "," + cellTwo_id + ").\n"
-    
-    ## encode cells sharing box
-    for rowStart in range(0,k*k,k):
-        for colStart in range(0,k*k,k):
-            ## looping inside box
-            for rowIndOne in range(rowStart, rowStart+k):
-                for colIndOne in range(colStart, colStart+k):
-                    for rowIndTwo in range(rowStart, rowStart+k):
-                        for colIndTwo in range(colStart, colStart+k):
-                            if not (rowIndOne == rowIndTwo and colIndOne == colIndTwo):
-                                cellOne_id = "c" + str(rowIndOne)+ "_"  + str(colIndOne) 
-                                cellTwo_id = "c" + str(rowIndTwo)+ "_"  + str(colIndTwo) 
-                                asp_code += "same_unit(" + cellOne_id + "," + cellTwo_id + ").\n"
-    
-    ## we need to encode that all cells take one of the k values => if not the others, it should be one
-    possible_values = range(k*k)
-    for possible_value in possible_values:
-        only_one_rule = "value(C," + str(possible_value) + ") :- cell(C),"
-        for smaller_val in possible_values[0:possible_value]:
-            only_one_rule += " not value(C," + str(smaller_val) + "),"
-        for bigger_val in possible_values[possible_value+1:]:
-            only_one_rule += " not value(C," + str(bigger_val) + "),"
-        only_one_rule = only_one_rule[:-1]  ##removing last comma
-        asp_code += only_one_rule + ".\n"
-    
-    ##encode the input values
-    for rowInd in range(k*k):
-        for colInd in range(k*k):
-            if sudoku[rowInd][colInd] != 0:
-                asp_code += "value(c" + str(rowInd) + "_" + str(colInd) + "," + str(sudoku[rowInd][colInd]-1) + ") :- .\n"
-
-    ## we only need to add: two cells that share a unit cannot take the same value
-    asp_code += ":- same_unit(C1, C2), value(C1, V), value(C2, V)."
+def solve_sudoku_ASP(sudoku,k,amo="pairwise",givens="facts",session=None,stats=None):
+    import clingo
+    ## a session (see ASPSession) has the structure grounded already, and only needs the input values
+    ## stats gets the time per phase (see timed_phase)
+    if session is not None:
+        return session.solve(sudoku, stats)
+    if amo not in ASP_AMO_RULES:
+        raise ValueError("Unknown at-most-one encoding: " + str(amo))
+    if givens not in ("facts", "context"):
+        raise ValueError("Unknown way to pass the givens: " + str(givens))
 
-    ## solve the model
-    control = clingo.Control()
-    control.add("base", [], asp_code)
-    control.ground([("base", [])])
+    ## the input values are passed as facts in the program text (givens="facts"),
+    ## or as symbols through the @givens() function of the grounding context (givens="context")
+    with timed_phase(stats, "encode"):
+        control = clingo.Control(["-c", "k=" + str(k)])
+        control.add("base", [], ASP_SUDOKU_PROGRAM + ASP_AMO_RULES[amo])
+        context = None
+        if givens == "facts":
+            facts = ["given(" + str(rowInd) + "," + str(colInd) + "," + str(sudoku[rowInd][colInd]) + ")."
+                     for rowInd in range(k*k) for colInd in range(k*k) if sudoku[rowInd][colInd] != 0]
+            control.add("base", [], "\n".join(facts))
+        else:
+            control.add("base", [], "given(R,C,V) :- (R,C,V) = @givens().")
+            context = ASPGivens(sudoku, k)
+    with timed_phase(stats, "ground"):
+        control.ground([("base", [])], context=context)
 
+    ## solve the model, and reconstruct the sudoku from the value(Row, Col, Value) atoms
     control.configuration.solve.models = 1
+    return decode_asp_models(control, [], sudoku, stats)
 
-    ## storing the values obtained by the model
-    vals = ""
+def asp_solutions(sudoku, k, amo="pairwise"):
+    ### yields every solution of sudoku, as the answer sets of the encoding of solve_sudoku_ASP (models=0)
+    import clingo
+    if amo not in ASP_AMO_RULES:
+        raise ValueError("Unknown at-most-one encoding: " + str(amo))
+    control = clingo.Control(["-c", "k=" + str(k), "--models=0"])
+    control.add("base", [], ASP_SUDOKU_PROGRAM + ASP_AMO_RULES[amo] + "given(R,C,V) :- (R,C,V) = @givens().")
+    control.ground([("base", [])], context=ASPGivens(sudoku, k))
     with control.solve(yield_=True) as handle:
         for model in handle:
-            vals = (model.symbols(atoms=True))
-
-    ## reconstruct sudoku
-    if vals:
-        for atom in vals:
-            atom = str(atom)
-            if atom[0] == "v":       ## focus on values
-                cell_str = atom.split("c")[1]
-                cell_id, val = cell_str.split(",")
-                cell_id = cell_id.split("_")
-                val = val[:-1]
-                sudoku[int(cell_id[0])][int(cell_id[1])] = int(val) + 1
-    else:
-        sudoku = None
+            solution = [row[:] for row in sudoku]
+            for atom in model.symbols(shown=True):
+                rowInd, colInd, val = (argument.number for argument in atom.arguments)
+                solution[rowInd][colInd] = val
+            yield solution
+
+def decode_asp_models(control, assumptions, sudoku, stats=None):
+    ### solves, and reads the value(Row, Col, Value) atoms of the first model into sudoku (None if there is no model)
+    symbols = None
+    with timed_phase(stats, "solve"):
+        with control.solve(assumptions=assumptions, yield_=True) as handle:
+            for model in handle:
+                symbols = model.symbols(shown=True)
+                break
+    if stats is not None:
+        ## the ground program, and the search of the last solve
+        statistics = control.statistics
+        stats["rules"] = int(statistics["problem"]["lp"]["rules"])
+        stats["atoms"] = int(statistics["problem"]["lp"]["atoms"])
+        stats["choices"] = stats.get("choices", 0) + int(statistics["solving"]["solvers"]["choices"])
+        stats["conflicts"] = stats.get("conflicts", 0) + int(statistics["solving"]["solvers"]["conflicts"])
+    if symbols is None:
+        return None
+    with timed_phase(stats, "decode"):
+        for atom in symbols:
+            rowInd, colInd, val = (argument.number for argument in atom.arguments)
+            sudoku[rowInd][colInd] = val
     return sudoku
+
+class ASPGivens(object):
+    '''
+    Grounding context for solve_sudoku_ASP, @givens() returns the input values as (row, col, value) tuples.
+    '''
+    def __init__(self, sudoku, k):
+        import clingo
+        self.tuples = [clingo.Function("", [clingo.Number(rowInd), clingo.Number(colInd), clingo.Number(sudoku[rowInd][colInd])])
+                       for rowInd in range(k*k) for colInd in range(k*k) if sudoku[rowInd][colInd] != 0]
+
+    def givens(self):
+        return self.tuples
+
+class ASPSession(object):
+    '''
+    A persistent clingo control for sudoku's of one size k (multi-shot solving).
+
+    The structural rules are grounded once, with given/3 as (free) external atoms for every cell and value.
+    Each sudoku is then solved with the given atoms of its input values as assumptions,
+    so nothing is grounded again, and the solver keeps what it learned between solves.
+    The externals are free instead of false, because false externals are fixed and cannot be assumed true
+    (a free given atom that is not assumed can only be true if its value is true anyway).
+    '''
+    def __init__(self, k, amo="pairwise"):
+        import clingo
+        if amo not in ASP_AMO_RULES:
+            raise ValueError("Unknown at-most-one encoding: " + str(amo))
+        self.k = k
+        self.control = clingo.Control(["-c", "k=" + str(k)])
+        self.control.add("base", [], ASP_SUDOKU_PROGRAM + ASP_AMO_RULES[amo] + "#external given(R,C,V) : pos(R), pos(C), val(V). [free]")
+        self.control.ground([("base", [])])
+        self.control.configuration.solve.models = 1
+
+        ## the solver literal of given(Row, Col, Value), so assumptions do not need symbol lookups
+        self.literals = {}
+        for atom in self.control.symbolic_atoms.by_signature("given", 3):
+            rowInd, colInd, val = (argument.number for argument in atom.symbol.arguments)
+            self.literals[(rowInd, colInd, val)] = atom.literal
+
+    def solve(self, sudoku, stats=None):
+        k = self.k
+        with timed_phase(stats, "encode"):
+            assumptions = []
+            for rowInd in range(k*k):
+                for colInd in range(k*k):
+                    if sudoku[rowInd][colInd] != 0:
+                        assumptions.append(self.literals[(rowInd, colInd, sudoku[rowInd][colInd])])
+        return decode_asp_models(self.control, assumptions, sudoku, stats)
+
+## one session per (k, amo), for callers that solve many sudoku's (e.g. batch mode in sudoku.py)
+_asp_sessions = {}
+
+def asp_session(k, amo="pairwise"):
+    if (k, amo) not in _asp_sessions:
+        _asp_sessions[(k, amo)] = ASPSession(k, amo)
+    return _asp_sessions[(k, amo)]
+
 ###
 ### Solver that uses ILP encoding
 ###
-def solve_sudoku_ILP(sudoku,k):
-    import gurobipy as gp
-    from gurobipy import GRB
-    model = gp.Model()
+## the ILP backends that solve_sudoku_ILP supports
+## (auto: gurobi if it is installed and licensed for the model size, otherwise ortools)
+ILP_BACKENDS = ("auto", "gurobi", "ortools")
 
-    ##Approach: vars stored in a tensor of rows by colums by possible values (k*k * k*k * k*k)
+def solve_sudoku_ILP(sudoku,k,backend="auto",ortools_solver="HIGHS",stats=None):
+    ##Approach: binary vars stored in a tensor of rows by colums by possible values (k*k * k*k * k*k)
     ## the potential values dimension in each cell should sum to 1 (i.e. there is exactly one value assigned to a cell)
     ## the row dimension for any given value should sum to 1 (each row has exactly 1 of each value)
     ## the col dimension for any given value should sum to 1 (each col has exactly 1 of each value)
     ## the box for any value should sum to 1 (each box has exactly 1 of each value)
+    ## the input values are set as lower bound 1 of their var
+    ## the solution is decoded by index: the value of a cell is the position of its 1 in the values dimension
+    ## backend selects the solver: gurobi (gurobipy matrix API), or ortools (pywraplp, with the
+    ## bundled MIP solver ortools_solver, e.g. HIGHS, SCIP or CBC), so gurobi is optional
+    ## stats gets the time per phase (see timed_phase)
+    return next(ilp_solutions(sudoku, k, backend, ortools_solver, stats), None)
 
-    ### adding vars in a matrix
-    var_matrix = [[0 for j in range(k*k)] for i in range(k*k)]
-    for rowInd in range(k*k):
-        for colInd in range(k*k):
-            var_matrix[rowInd][colInd] = model.addVars(k*k, vtype = 'I', name = str(rowInd)+ "_" + str(colInd))
-    
+def ilp_solutions(sudoku, k, backend="auto", ortools_solver="HIGHS", stats=None):
+    ### yields every solution of sudoku, from the selected backend (see solve_sudoku_ILP)
+    if backend == "auto":
+        try:
+            import gurobipy
+        except ImportError:
+            backend = "ortools"
+        else:
+            solutions = ilp_solutions_gurobi(sudoku, k, stats)
+            try:
+                first = next(solutions, None)
+            except gurobipy.GurobiError:
+                ## e.g. a size-limited license
+                backend = "ortools"
+            else:
+                if first is not None:
+                    yield first
+                    yield from solutions
+                return
+    if backend == "gurobi":
+        yield from ilp_solutions_gurobi(sudoku, k, stats)
+    elif backend == "ortools":
+        yield from ilp_solutions_ortools(sudoku, k, ortools_solver, stats)
+    else:
+        raise ValueError("Unknown ILP backend: " + str(backend))
 
-    ## every cell should have one value
-    for rowInd in range(k*k):
-        for colInd in range(k*k):
-            model.addConstr(gp.quicksum([var_matrix[rowInd][colInd][i] for i in range(k*k)]) == 1, "constr_row" + str(rowInd) + "_col" + str(colInd))
+def solve_sudoku_ILP_gurobi(sudoku, k, stats=None):
+    return next(ilp_solutions_gurobi(sudoku, k, stats), None)
 
-    ## adding: row constraints
-    for rowInd in range(k*k):
-        ## everything should appear once
-        for possible_value in range(k*k):
-            model.addConstr(gp.quicksum([var_matrix[rowInd][i][possible_value] for i in range(k*k)]) == 1, "constr_row" + str(rowInd) + "_val" + str(possible_value))
-
-    ## adding: col constraints
-    for colInd in range(k*k):
-        ## everything should appear once
-        for possible_value in range(k*k):
-            model.addConstr(gp.quicksum([var_matrix[i][colInd][possible_value] for i in range(k*k)]) == 1, "constr_col" + str(colInd) + "_val" + str(possible_value))
-
-    ## addong: box constraints
-    for rowStart in range(0,k*k,k):
-        for colStart in range(0,k*k,k):
-            box_vars = []
-            for rowInd in range(rowStart, rowStart+k):
-                for colInd in range(colStart, colStart+k):
-                    box_vars.append(var_matrix[rowInd][colInd])
-            for possible_value in range(k*k):
-                model.addConstr(gp.quicksum([box_vars[i][possible_value] for i in range(k*k)]) == 1, "constr_box" + str(rowStart) + str(colStart) + "_val" + str(possible_value))
-
-
-    ## adding inputs
+def ilp_solutions_gurobi(sudoku, k, stats=None):
+    ### yields every solution of sudoku, with a no-good cut after each one (see ilp_no_good)
+    import gurobipy as gp
+    from gurobipy import GRB
+    n = k*k
+    with timed_phase(stats, "encode"):
+        model = gp.Model()
+
+        ### adding vars as one tensor
+        x = model.addMVar((n, n, n), vtype=GRB.BINARY)
+
+        ## every cell should have one value, every row and col should have each value once
+        model.addConstr(x.sum(axis=2) == 1)
+        model.addConstr(x.sum(axis=1) == 1)
+        model.addConstr(x.sum(axis=0) == 1)
+        ## every box should have each value once: the tensor as (boxRow, rowInBox, boxCol, colInBox, value)
+        model.addConstr(x.reshape(k, k, k, k, n).sum(axis=(1, 3)) == 1)
+
+        ## adding inputs
+        x.lb = ilp_input_bounds(sudoku, k)
+
+    while True:
+        with timed_phase(stats, "solve"):
+            model.optimize();
+        if stats is not None:
+            stats["variables"] = model.NumVars
+            stats["constraints"] = model.NumConstrs
+            stats["nodes"] = stats.get("nodes", 0) + int(model.NodeCount)
+            stats["iterations"] = stats.get("iterations", 0) + int(model.IterCount)
+            stats["runtime"] = stats.get("runtime", 0.0) + model.Runtime
+        ### reconstructing sudoku
+        if model.status != GRB.OPTIMAL:
+            return
+        with timed_phase(stats, "decode"):
+            values = x.X
+            solution = ilp_decode(values, [row[:] for row in sudoku], k)
+        yield solution
+        model.addConstr((x * ilp_no_good(values)).sum() <= n*n - 1)
+
+def solve_sudoku_ILP_ortools(sudoku, k, ortools_solver="HIGHS", stats=None):
+    return next(ilp_solutions_ortools(sudoku, k, ortools_solver, stats), None)
+
+def ilp_solutions_ortools(sudoku, k, ortools_solver="HIGHS", stats=None):
+    ### yields every solution of sudoku, with a no-good cut after each one (see ilp_no_good)
+    import numpy as np
+    from ortools.linear_solver import pywraplp
+    n = k*k
+    solver = pywraplp.Solver.CreateSolver(ortools_solver)
+    if solver is None:
+        raise ValueError("MIP solver not available in ortools: " + str(ortools_solver))
+
+    with timed_phase(stats, "encode"):
+        ### adding vars as one tensor (of pywraplp variables), with the inputs as lower bounds
+        lower_bounds = ilp_input_bounds(sudoku, k)
+        x = np.empty((n, n, n), dtype=object)
+        for index in np.ndindex(n, n, n):
+            x[index] = solver.IntVar(lower_bounds[index], 1, "")
+
+        ## each group of vars (a row of the matrices below) should sum to 1:
+        ## the values of a cell, and the cells of a row, col and box that can take a value
+        groups = (
+            x.reshape(-1, n),
+            x.transpose(0, 2, 1).reshape(-1, n),
+            x.transpose(1, 2, 0).reshape(-1, n),
+            x.reshape(k, k, k, k, n).transpose(0, 2, 4, 1, 3).reshape(-1, n),
+        )
+        for group in groups:
+            for group_vars in group:
+                solver.Add(solver.Sum(list(group_vars)) == 1)
+
+    while True:
+        with timed_phase(stats, "solve"):
+            start = time.perf_counter()
+            status = solver.Solve()
+            runtime = time.perf_counter() - start
+        if stats is not None:
+            stats["variables"] = solver.NumVariables()
+            stats["constraints"] = solver.NumConstraints()
+            stats["nodes"] = stats.get("nodes", 0) + solver.nodes()
+            stats["iterations"] = stats.get("iterations", 0) + solver.iterations()
+            ## the time of Solve() only, like Runtime of gurobi (wall_time() counts from the creation of the solver)
+            stats["runtime"] = stats.get("runtime", 0.0) + runtime
+        ### reconstructing sudoku
+        if status not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+            return
+        with timed_phase(stats, "decode"):
+            values = np.vectorize(lambda var: var.solution_value())(x)
+            solution = ilp_decode(values, [row[:] for row in sudoku], k)
+        yield solution
+        solver.Add(solver.Sum(list(x[ilp_no_good(values) == 1])) <= n*n - 1)
+
+def ilp_no_good(values):
+    ### the vars that are 1 in a solution (as a 0/1 tensor): a no-good cut allows at most k^4 - 1 of them,
+    ## so the next solution differs in at least one cell
+    return (values > 0.5).astype(float)
+
+def ilp_input_bounds(sudoku, k):
+    ### the lower bounds of the var tensor: 1 for the input value of a cell, 0 otherwise
+    import numpy as np
+    n = k*k
+    grid = np.array(sudoku, dtype=np.int64).reshape(n, n)
+    lower_bounds = np.zeros((n, n, n))
+    rowInds, colInds = np.nonzero(grid)
+    lower_bounds[rowInds, colInds, grid[rowInds, colInds] - 1] = 1
+    return lower_bounds
+
+def ilp_decode(values, sudoku, k):
+    ### writes the solution tensor into sudoku: the value of a cell is the index of its largest var (+1)
+    solution = values.argmax(axis=2) + 1
     for rowInd in range(k*k):
         for colInd in range(k*k):
-            if sudoku[rowInd][colInd] != 0:
-                model.addConstr(var_matrix[rowInd][colInd][sudoku[rowInd][colInd]-1] == 1, "constr_input_" + str(rowInd) + str(colInd))
+            sudoku[rowInd][colInd] = int(solution[rowInd][colInd])
+    return sudoku
 
+###
+### Solver that uses exact cover (Algorithm X with dancing links)
+###
+def solve_sudoku_DLX(sudoku, k, mode="first", limit=None, stats=None):
+    ## Approach:
+    ## sudoku as exact cover: a row for each candidate (cell, value), a column for each constraint
+    ## (each cell has a value, each row/col/box has each value), a candidate covers 4 columns
+    ## the input values are selected before the search, and Algorithm X (see DancingLinks) picks rows
+    ## until every column is covered exactly once
+    ## mode "first" returns the first solution (or None), "count" the number of solutions,
+    ## and "all" a list of all solutions (count and all stop after limit solutions, if given)
+    ## stats gets the time per phase (see timed_phase), the solve phase includes decoding
+    if mode not in DLX_MODES:
+        raise ValueError("Unknown DLX mode: " + str(mode))
+    with timed_phase(stats, "encode"):
+        links = DancingLinks(k)
+        search = links.sudoku_solutions(sudoku)
+    ## islice stops right after the limit-th solution, without searching on for the next one
+    solutions = search if limit is None else islice(search, limit)
+    with timed_phase(stats, "solve"):
+        try:
+            if mode == "first":
+                result = next(solutions, None)
+            elif mode == "count":
+                result = sum(1 for _ in solutions)
+            else:
+                result = list(solutions)
+        finally:
+            search.close()
+    if stats is not None:
+        stats["nodes"] = stats.get("nodes", 0) + links.nodes
+        stats["backtracks"] = stats.get("backtracks", 0) + links.backtracks
+    return result
 
+## the modes of solve_sudoku_DLX
+DLX_MODES = ("first", "count", "all")
 
-    model.optimize();
-    ### reconstructing sudoku
-    if model.status == GRB.OPTIMAL:
-        for v in model.getVars():
-            if int(v.x) != 0:
-                name_split = v.varName.split("[")
-                ind_split = name_split[0].split("_")
-                sudoku[int(ind_split[0])][int(ind_split[1])] = int(name_split[1][:-1])+1
-    else:
-        sudoku = None
-    return sudoku
\ No newline at end of file
+class DancingLinks(object):
+    '''
+    The exact cover matrix of sudoku's of size k, as dancing links in flat arrays.
+
+    Node 0 is the root, nodes 1..4*k^4 are the column headers, then 4 nodes per candidate.
+    left/right/up/down link the nodes of a row/column in circular lists, column[node] is the header of a node,
+    size[header] the number of nodes in a column, and candidate[node] the candidate (cell*k*k + value-1) of a node.
+    Covering a column unlinks it and every row that intersects it, uncovering relinks them in reverse order.
+    nodes and backtracks count the rows tried and the columns that ran out of rows in the searches.
+    '''
+    def __init__(self, k):
+        n = k*k
+        self.k = k
+        self.nodes = 0
+        self.backtracks = 0
+        num_columns = 4*n*n
+        self.left = [ind - 1 for ind in range(num_columns + 1)]
+        self.right = [ind + 1 for ind in range(num_columns + 1)]
+        self.left[0] = num_columns
+        self.right[num_columns] = 0
+        self.up = list(range(num_columns + 1))
+        self.down = list(range(num_columns + 1))
+        self.column = list(range(num_columns + 1))
+        self.size = [0] * (num_columns + 1)
+        self.candidate = [-1] * (num_columns + 1)
+        self.first_node = []
+
+        ## columns: cell, (row, value), (col, value), (box, value), numbered from 1
+        for cell in range(n*n):
+            rowInd, colInd = divmod(cell, n)
+            box = (rowInd // k)*k + colInd // k
+            for value in range(n):
+                headers = (1 + cell, 1 + n*n + rowInd*n + value, 1 + 2*n*n + colInd*n + value, 1 + 3*n*n + box*n + value)
+                first = len(self.column)
+                self.first_node.append(first)
+                for ind, header in enumerate(headers):
+                    node = first + ind
+                    self.left.append(first + (ind - 1) % 4)
+                    self.right.append(first + (ind + 1) % 4)
+                    self.up.append(self.up[header])
+                    self.down.append(header)
+                    self.down[self.up[header]] = node
+                    self.up[header] = node
+                    self.column.append(header)
+                    self.candidate.append(cell*n + value)
+                    self.size[header] += 1
+
+    def cover(self, header):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        row = down[header]
+        while row != header:
+            node = right[row]
+            while node != row:
+                down[up[node]] = down[node]
+                up[down[node]] = up[node]
+                size[column[node]] -= 1
+                node = right[node]
+            row = down[row]
+
+    def uncover(self, header):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        row = up[header]
+        while row != header:
+            node = left[row]
+            while node != row:
+                size[column[node]] += 1
+                down[up[node]] = node
+                up[down[node]] = node
+                node = left[node]
+            row = up[row]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def select(self, row):
+        ## covers the other columns of a row (its own column is already covered)
+        node = self.right[row]
+        while node != row:
+            self.cover(self.column[node])
+            node = self.right[node]
+
+    def deselect(self, row):
+        node = self.left[row]
+        while node != row:
+            self.uncover(self.column[node])
+            node = self.left[node]
+
+    def search(self):
+        ### Algorithm X, with an explicit stack instead of recursion
+        ## yields the list of selected rows for each exact cover (the same list, changed while searching)
+        ## branches on the column with the fewest rows
+        right, down, size = self.right, self.down, self.size
+        rows = []
+        headers = []
+        descend = True
+        while True:
+            if descend:
+                if right[0] == 0:
+                    yield rows
+                    descend = False
+                    continue
+                header = right[0]
+                header_size = size[header]
+                ind = right[header]
+                while ind != 0 and header_size > 1:
+                    if size[ind] < header_size:
+                        header, header_size = ind, size[ind]
+                    ind = right[ind]
+                self.cover(header)
+                headers.append(header)
+                row = down[header]
+            else:
+                ## backtrack: undo the row of the last column, and try its next row
+                if not rows:
+                    return
+                row = rows.pop()
+                self.deselect(row)
+                header = headers[-1]
+                row = down[row]
+
+            if row == header:
+                ## no rows left for this column
+                self.backtracks += 1
+                self.uncover(header)
+                headers.pop()
+                descend = False
+                if not headers:
+                    return
+                continue
+            self.nodes += 1
+            rows.append(row)
+            self.select(row)
+            descend = True
+
+    def sudoku_solutions(self, sudoku):
+        ### yields the solutions of sudoku, and restores the links afterwards
+        k = self.k
+        n = k*k
+
+        ## select the rows of the input values, two input values that share a column are a contradiction
+        selected = []
+        covered = set()
+        for rowInd in range(n):
+            for colInd in range(n):
+                if sudoku[rowInd][colInd] != 0:
+                    row = self.first_node[(rowInd*n + colInd)*n + sudoku[rowInd][colInd] - 1]
+                    row_columns = [self.column[row + ind] for ind in range(4)]
+                    if covered.intersection(row_columns):
+                        self.unselect_all(selected)
+                        return
+                    covered.update(row_columns)
+                    self.cover(self.column[row])
+                    self.select(row)
+                    selected.append(row)
+
+        try:
+            for rows in self.search():
+                solution = [row[:] for row in sudoku]
+                for row in rows:
+                    cell, value = divmod(self.candidate[row], n)
+                    solution[cell // n][cell % n] = value + 1
+                yield solution
+        finally:
+            self.unselect_all(selected)
+
+    def unselect_all(self, selected):
+        ## undoes the selection of the input rows, in reverse order
+        for row in reversed(selected):
+            self.deselect(row)
+            self.uncover(self.column[row])
+
+###
+### Enumeration: the solutions of a sudoku, one by one, from each backend
+###
+
+## the solvers that sudoku_solutions() supports
+SOLUTION_BACKENDS = ("prop", "dlx", "sat", "csp", "asp", "ilp")
+
+def sudoku_solutions(sudoku, k, solver="prop"):
+    ### yields the solutions of sudoku lazily: the search only continues when the next solution is asked for
+    ## - prop: the search of solve_sudoku_bitmask continues after each solution
+    ## - dlx: Algorithm X continues after each exact cover
+    ## - sat: a blocking clause excludes each model
+    ## - csp: CP-SAT enumerates all solutions, with a solution callback
+    ## - asp: clingo with models=0
+    ## - ilp: a no-good cut excludes each solution
+    ## close() the generator (or let it finish) to stop the search
+    if solver == "prop":
+        return prop_solutions(sudoku, k)
+    elif solver == "dlx":
+        return DancingLinks(k).sudoku_solutions(sudoku)
+    elif solver == "sat":
+        return sat_solutions(sudoku, k)
+    elif solver == "csp":
+        return csp_template(k).solutions(sudoku)
+    elif solver == "asp":
+        return asp_solutions(sudoku, k)
+    elif solver == "ilp":
+        return ilp_solutions(sudoku, k)
+    raise ValueError("Unknown solver: " + str(solver))
+
+def count_sudoku_solutions(sudoku, k, solver="prop", limit=None):
+    ### counts the solutions of sudoku, stopping after limit solutions (if given)
+    ## e.g. limit=2 is enough to know if the solution is unique (see has_unique_solution)
+    solutions = sudoku_solutions(sudoku, k, solver)
+    count = 0
+    try:
+        for _ in solutions:
+            count += 1
+            if limit is not None and count >= limit:
+                break
+    finally:
+        solutions.close()
+    return count
+
+def has_unique_solution(sudoku, k, solver="prop"):
+    return count_sudoku_solutions(sudoku, k, solver, limit=2) == 1
+
+###
+### Solvers by name, and solving with statistics
+###
+
+## every backend, with the signature solver(sudoku, k, ..., stats=None)
+SOLVERS = {
+    "prop": solve_sudoku_bitmask,
+    "dlx": solve_sudoku_DLX,
+    "sat": solve_sudoku_SAT,
+    "csp": solve_sudoku_CSP,
+    "asp": solve_sudoku_ASP,
+    "ilp": solve_sudoku_ILP,
+}
+
+def solve_with_stats(solver, sudoku, k, hooks=(), **options):
+    ### solves sudoku with a backend (a name in SOLVERS), and returns (solution, SolverStats)
+    ## hooks are called at the phase boundaries (see SolverStats), options go to the backend
+    stats = SolverStats(hooks)
+    solution = SOLVERS[solver](deepcopy(sudoku), k, stats=stats, **options)
+    return solution, stats
+
+###
+### Portfolio: all solvers race on the same sudoku
+###
+
+## the solvers of the portfolio, by name (prop uses bitmask domains)
+PORTFOLIO_SOLVERS = ("prop", "dlx", "sat", "csp", "asp", "ilp")
+
+def solve_sudoku_portfolio(sudoku, k, solvers=PORTFOLIO_SOLVERS, stats=None, timeout=None):
+    import multiprocessing
+    import queue
+
+    ## Approach:
+    ## every solver runs in its own process, and sends (name, result, error) back over one queue
+    ## the first solution that is valid (see is_valid_solution) is returned, and the other processes are terminated
+    ## a solver that finds no solution only decides the race once every solver has answered without one
+    ## (so an engine that gives up or fails early does not end it), and solvers that fail are skipped
+    ## stats["winner"] gets the name of the solver whose answer is returned
+    ## (for no solution, the first solver that reported none; None if every solver failed or timed out),
+    ## and stats["seconds"] the time it took
+    ## timeout (in seconds) bounds the whole race, after it None is returned
+    start = time.perf_counter()
+    results = multiprocessing.Queue()
+    processes = []
+    for name in solvers:
+        process = multiprocessing.Process(target=portfolio_worker, args=(name, sudoku, k, results), daemon=True)
+        process.start()
+        processes.append(process)
+
+    winner = None
+    answer = None
+    no_solution = None
+    try:
+        remaining = len(processes)
+        while remaining > 0:
+            wait = None
+            if timeout is not None:
+                wait = timeout - (time.perf_counter() - start)
+                if wait <= 0:
+                    break
+            try:
+                name, result, error = results.get(timeout=wait)
+            except queue.Empty:
+                break
+            remaining -= 1
+            if error is not None:
+                continue
+            if result is None:
+                ## no solution: only the answer if no other solver finds one
+                if no_solution is None:
+                    no_solution = name
+                continue
+            if is_valid_solution(result, sudoku, k):
+                winner = name
+                answer = result
+                break
+        else:
+            winner = no_solution
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+        results.close()
+
+    if stats is not None:
+        stats["winner"] = winner
+        stats["seconds"] = time.perf_counter() - start
+    return answer
+
+def portfolio_worker(name, sudoku, k, results):
+    ### runs one solver of the portfolio (in its own process), and puts (name, result, error) on results
+    try:
+        results.put((name, SOLVERS[name](deepcopy(sudoku), k), None))
+    except Exception as e:
+        results.put((name, None, str(e)))
@@ -0,0 +1,216 @@
+#!python
+
+import sys, os
+import argparse
+import glob
+import itertools
+
+### Corpora: many sudoku's (of any k) in one file, read and written as a stream
+#
+# Two formats, chosen by the extension of the file:
+# - line corpus (LINE_EXTENSION): one sudoku per line, k**4 numbers separated by spaces, row by row,
+#   or (for k=3) 81 characters where 0 or . is an empty cell (the line format of read_sudokus_from_file in sudoku.py)
+# - binary corpus (BINARY_EXTENSION): a header of 8 bytes (BINARY_MAGIC, a version byte and k),
+#   followed by the sudoku's as k**4 bytes each, row by row (0 is an empty cell, so k is at most 15)
+#   the file can be memory-mapped as a numpy array of shape (count, k*k, k*k), and sliced without reading the rest
+# Both are read in chunks of sudoku's, which are validated with numpy at once (see valid_grids)
+
+LINE_EXTENSION = ".sudokus";
+BINARY_EXTENSION = ".sudokub";
+# The files that are read from a directory: sudoku files (see read_sudokus_from_file in sudoku.py) and corpora
+INPUT_EXTENSIONS = [".sudoku", LINE_EXTENSION, BINARY_EXTENSION];
+BINARY_MAGIC = b"SDKB";
+BINARY_VERSION = 1;
+BINARY_HEADER_SIZE = 8;
+CHUNK_SIZE = 4096;
+
+### Main: convert sudoku's (files, directories, glob patterns or corpora) to a single corpus
+def main():
+    parser = argparse.ArgumentParser(description="Convert sudoku's to a line corpus (" + LINE_EXTENSION + ") or a binary corpus (" + BINARY_EXTENSION + ")");
+    parser.add_argument("inputs", nargs="+", help="sudoku files, directories (all *.sudoku files and corpora in them), glob patterns or corpora");
+    parser.add_argument("-o", "--output", required=True, help="corpus to write, the format follows from the extension");
+    parser.add_argument("-a", "--append", action="store_true", help="add the sudoku's to the end of the output, if it exists (default: overwrite it)");
+    parser.add_argument("-k", "--size", type=int, default=None, help="only keep sudoku's of this size (a binary corpus holds a single size; default: the size of the first sudoku)");
+    args = parser.parse_args();
+
+    sudokus = (sudoku for input in args.inputs for sudoku in read_sudokus(input));
+    valid = ((k,sudoku) for k,sudoku in sudokus if sudoku != None);
+    if args.size != None:
+        valid = ((k,sudoku) for k,sudoku in valid if k == args.size);
+    if is_binary_corpus(args.output):
+        # The size of the corpus is the size of its first sudoku, the others are skipped
+        first = next(valid, None);
+        if first == None:
+            print("No sudoku's to write", file=sys.stderr);
+            return;
+        k = first[0];
+        valid = (sudoku for size,sudoku in itertools.chain([first], valid) if size == k);
+        count = write_binary_corpus(args.output, valid, k, args.append);
+    else:
+        count = write_line_corpus(args.output, valid, args.append);
+    print("Wrote " + str(count) + " sudoku's to " + args.output, file=sys.stderr);
+
+def is_line_corpus(filename):
+    return filename.endswith(LINE_EXTENSION);
+
+def is_binary_corpus(filename):
+    return filename.endswith(BINARY_EXTENSION);
+
+### Stream the sudoku's of an input as (k,sudoku) pairs, with (None,None) for sudoku's in the wrong format
+### (a corpus, a directory or glob pattern of files, or a single file in a format of read_sudokus_from_file)
+def read_sudokus(input):
+    from sudoku import read_sudokus_from_file;
+    for filename in input_filenames(input):
+        if is_binary_corpus(filename):
+            yield from iter_binary_corpus(filename);
+        elif is_line_corpus(filename):
+            yield from iter_line_corpus(filename);
+        else:
+            yield from read_sudokus_from_file(filename);
+
+### The files of an input: all files with one of INPUT_EXTENSIONS in a directory, the files that match a glob pattern, or a single file
+### (the same for batch mode in sudoku.py and for the conversion to a corpus)
+def input_filenames(input):
+    if os.path.isdir(input):
+        return sorted(filename for extension in INPUT_EXTENSIONS for filename in glob.glob(os.path.join(input, "*" + extension)));
+    elif glob.has_magic(input):
+        return sorted(glob.glob(input));
+    else:
+        return [input];
+
+###
+### Line corpus
+###
+
+### Stream the sudoku's of a line corpus, as (k,sudoku) pairs in the order of the lines
+### (lines in the wrong format give (None,None), empty lines are skipped)
+### the file is opened right away, so a missing file raises here and not while streaming
+def iter_line_corpus(filename, chunk_size=CHUNK_SIZE):
+    return line_corpus_chunks(open(filename, "r"), chunk_size);
+
+def line_corpus_chunks(file, chunk_size):
+    with file:
+        lines = (line.strip() for line in file if line.strip() != "");
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size));
+            if len(chunk) == 0:
+                return;
+            yield from parse_sudoku_lines(chunk);
+
+### Parse lines to (k,sudoku) pairs, like parse_sudoku_line in sudoku.py, but the lines with the same
+### number of entries are converted and validated at once, instead of entry by entry
+def parse_sudoku_lines(lines):
+    import numpy as np;
+    parsed = [(None,None)] * len(lines);
+    # Group the lines by their number of entries (None for 81 characters: one digit or . per cell)
+    # the 81 characters are decoded as one byte each, so only ASCII lines are grouped that way
+    # (others are not a sudoku, and would shift the grids after them)
+    groups = {};
+    for index, line in enumerate(lines):
+        if len(line) == 81 and " " not in line and line.isascii():
+            groups.setdefault(None, []).append(index);
+        else:
+            groups.setdefault(len(line.split()), []).append(index);
+    for length, indices in groups.items():
+        if length == None:
+            k = 3;
+            text = "".join(lines[index] for index in indices).replace(".", "0");
+            # Other characters than digits end up out of range, and fail the validation
+            entries = np.frombuffer(text.encode(), dtype=np.uint8).astype(np.int64) - ord("0");
+        else:
+            k = int(round(length ** 0.25));
+            if length != k**4 or k < 1:
+                continue;
+            try:
+                entries = np.array([lines[index].split() for index in indices], dtype=np.int64);
+            except ValueError:
+                # Some line of the group is not all numbers: parse them one at a time
+                for index in indices:
+                    parsed[index] = parse_sudoku_lines([lines[index]])[0] if len(indices) > 1 else (None,None);
+                continue;
+        grids = entries.reshape(-1, k*k, k*k);
+        for index, grid, valid in zip(indices, grids.tolist(), valid_grids(grids, k)):
+            if valid:
+                parsed[index] = (k,grid);
+    return parsed;
+
+### Write (k,sudoku) pairs to a line corpus, and return how many were written
+### (the file is overwritten, or with append, the sudoku's are added to the end)
+def write_line_corpus(filename, sudokus, append=False):
+    count = 0;
+    with open(filename, "a" if append else "w") as file:
+        for k,sudoku in sudokus:
+            file.write(" ".join(str(value) for row in sudoku for value in row) + "\n");
+            count += 1;
+    return count;
+
+###
+### Binary corpus
+###
+
+### Memory-map a binary corpus: returns k and a read-only numpy array of shape (count, k*k, k*k)
+### (only the slices that are used are read from disk)
+def open_binary_corpus(filename):
+    import numpy as np;
+    with open(filename, "rb") as file:
+        header = file.read(BINARY_HEADER_SIZE);
+    if len(header) != BINARY_HEADER_SIZE or header[:4] != BINARY_MAGIC:
+        raise ValueError(filename + " is not a binary sudoku corpus");
+    if header[4] != BINARY_VERSION:
+        raise ValueError(filename + " has an unknown version of the binary format (" + str(header[4]) + ")");
+    k = header[5];
+    n = k*k;
+    count = (os.path.getsize(filename) - BINARY_HEADER_SIZE) // (n*n);
+    if count == 0:
+        return k, np.zeros((0, n, n), dtype=np.uint8);
+    return k, np.memmap(filename, dtype=np.uint8, mode="r", offset=BINARY_HEADER_SIZE, shape=(count, n, n));
+
+### Stream the sudoku's of a binary corpus, as (k,sudoku) pairs (with (None,None) for entries out of range)
+### the header is checked right away, so a wrong file raises here and not while streaming
+def iter_binary_corpus(filename, chunk_size=CHUNK_SIZE):
+    k, grids = open_binary_corpus(filename);
+    return binary_corpus_chunks(k, grids, chunk_size);
+
+def binary_corpus_chunks(k, grids, chunk_size):
+    for start in range(0, len(grids), chunk_size):
+        chunk = grids[start:start+chunk_size];
+        for grid, valid in zip(chunk.tolist(), valid_grids(chunk, k)):
+            yield (k,grid) if valid else (None,None);
+
+### Write sudoku's of size k to a binary corpus, and return how many were written
+### (the file is overwritten, or with append, the sudoku's are added to the end of an existing corpus)
+def write_binary_corpus(filename, sudokus, k, append=False, chunk_size=CHUNK_SIZE):
+    import numpy as np;
+    n = k*k;
+    if n > 255:
+        raise ValueError("The binary corpus stores a cell in one byte, so k is at most 15");
+    count = 0;
+    append = append and os.path.exists(filename) and os.path.getsize(filename) > 0;
+    if append and open_binary_corpus(filename)[0] != k:
+        raise ValueError(filename + " holds sudoku's of another size");
+    with open(filename, "ab" if append else "wb") as file:
+        if not append:
+            file.write(BINARY_MAGIC + bytes([BINARY_VERSION, k, 0, 0]));
+        sudokus = iter(sudokus);
+        while True:
+            chunk = list(itertools.islice(sudokus, chunk_size));
+            if len(chunk) == 0:
+                return count;
+            grids = np.asarray(chunk, dtype=np.int64).reshape(-1, n, n);
+            if not valid_grids(grids, k).all():
+                raise ValueError("Entries of a sudoku of size " + str(k) + " are between 0 and " + str(n));
+            file.write(grids.astype(np.uint8).tobytes());
+            count += len(grids);
+
+###
+### Validation
+###
+
+### Check which of the grids (an array of shape (count, k*k, k*k)) only have entries between 0 and k*k
+def valid_grids(grids, k):
+    import numpy as np;
+    grids = np.asarray(grids);
+    return ((grids >= 0) & (grids <= k*k)).all(axis=(1, 2));
+
+if __name__ == "__main__":
+    main();
@@ -0,0 +1,154 @@
+#!python
+
+import os
+import argparse
+import json
+import random
+import time
+import multiprocessing
+
+from sudoku_core import sat_session
+from sudoku_core import SolverStats
+from sudoku_core import solve_sudoku_bitmask
+from sudoku import plain_repr
+
+### Main
+def main():
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Generate sudoku's with a unique solution, and write them to files that sudoku.py can read");
+    parser.add_argument("-k", "--size", type=int, default=3, help="size of the sudoku's (default: 3)");
+    parser.add_argument("-n", "--count", type=int, default=10, help="number of sudoku's to generate (default: 10)");
+    parser.add_argument("-o", "--output", default="generated", help="directory to write the sudoku's to (default: generated)");
+    parser.add_argument("--seed", type=int, default=0, help="random seed, sudoku i is generated with seed+i (default: 0)");
+    parser.add_argument("--min-backtracks", type=int, default=0, help="only keep sudoku's that take the prop solver at least this many backtracks (default: 0)");
+    parser.add_argument("--max-backtracks", type=int, default=None, help="stop removing clues before the prop solver needs more backtracks than this (default: no limit)");
+    parser.add_argument("--min-clues", type=int, default=0, help="stop removing clues at this many clues (default: 0, remove as many as possible)");
+    parser.add_argument("-a", "--attempts", type=int, default=20, help="full grids to try per sudoku before giving up on the difficulty (default: 20)");
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: number of cpus)");
+    args = parser.parse_args();
+    if args.attempts < 1:
+        parser.error("--attempts should be at least 1");
+
+    os.makedirs(args.output, exist_ok=True);
+    jobs = [{"k": args.size, "index": index, "seed": args.seed + index, "min_backtracks": args.min_backtracks,
+             "max_backtracks": args.max_backtracks, "min_clues": args.min_clues, "attempts": args.attempts, "output": args.output}
+            for index in range(args.count)];
+
+    # Generate the sudoku's, and stream a JSON line per sudoku (in the order they finish)
+    if args.workers == 1:
+        results = map(generate_job, jobs);
+        for result in results:
+            print(json.dumps(result), flush=True);
+    else:
+        with multiprocessing.Pool(args.workers) as pool:
+            for result in pool.imap_unordered(generate_job, jobs):
+                print(json.dumps(result), flush=True);
+
+### Generate one sudoku, and write it to a file in the output directory
+def generate_job(job):
+    start = time.perf_counter();
+    rng = random.Random(job["seed"]);
+    puzzle = None;
+    attempt = 0;
+    for attempt in range(1, job["attempts"]+1):
+        candidate, backtracks = generate_puzzle(job["k"], rng, job["max_backtracks"], job["min_clues"]);
+        if backtracks >= job["min_backtracks"]:
+            puzzle = candidate;
+            break;
+    result = {"index": job["index"], "k": job["k"], "seed": job["seed"], "attempts": attempt};
+    result["seconds"] = time.perf_counter() - start;
+    if puzzle == None:
+        result["status"] = "too_easy";
+        return result;
+    filename = os.path.join(job["output"], "gen-k" + str(job["k"]) + "-" + str(job["index"]) + ".sudoku");
+    with open(filename, "w") as file:
+        # read_sudoku_from_file expects every row to end with a newline
+        file.write(plain_repr(puzzle, job["k"]) + "\n");
+    result.update({"status": "generated", "file": filename, "clues": count_clues(puzzle), "backtracks": backtracks});
+    return result;
+
+### A random sudoku with a unique solution, and the number of backtracks the prop solver needs for it
+def generate_puzzle(k, rng, max_backtracks=None, min_clues=0):
+    solution = random_solution(k, rng);
+    puzzle = remove_clues_uniquely(solution, k, rng, max_backtracks, min_clues);
+    return puzzle, difficulty(puzzle, k);
+
+### A random filled in sudoku
+def random_solution(k, rng):
+    # The boxes on the diagonal share no row or column, so they are filled in with random values;
+    # the solver fills in the rest, and shuffling randomizes the part that the solver chose
+    # (for k=3 and up any values in them can be completed, for k=2 some can't, and other values are tried)
+    n = k*k;
+    solution = None;
+    while solution == None:
+        sudoku = [[0]*n for rowInd in range(n)];
+        for box in range(k):
+            values = rng.sample(range(1, n+1), n);
+            for ind in range(n):
+                sudoku[box*k + ind // k][box*k + ind % k] = values[ind];
+        solution = solve_sudoku_bitmask(sudoku, k);
+    return shuffle_solution(solution, k, rng);
+
+### Empty the cells of a filled in sudoku in random order, skipping cells that would make the solution not unique
+### (and, with max_backtracks, cells that would make the sudoku harder than that)
+def remove_clues_uniquely(solution, k, rng, max_backtracks=None, min_clues=0):
+    n = k*k;
+    puzzle = [row[:] for row in solution];
+    clues = n*n;
+    for cell in rng.sample(range(n*n), n*n):
+        if clues <= min_clues:
+            break;
+        rowInd, colInd = divmod(cell, n);
+        value = puzzle[rowInd][colInd];
+        puzzle[rowInd][colInd] = 0;
+        if has_other_solution(puzzle, k, cell, value) or (max_backtracks != None and difficulty(puzzle, k) > max_backtracks):
+            puzzle[rowInd][colInd] = value;
+        else:
+            clues -= 1;
+    return puzzle;
+
+### Check if a sudoku has a solution with another value than value in cell
+### (for a sudoku of which value in cell is part of a solution, this means it has at least two solutions;
+### it stops at the first such solution, and needs one search instead of counting up to two)
+# The SAT session of this process solves under assumptions, so nothing is encoded per check,
+# and its learned clauses carry over to the next checks (the prop search is only used for the difficulty)
+def has_other_solution(puzzle, k, cell, value):
+    return sat_session(k).solve(puzzle, exclude=[(cell, value)]) != None;
+
+### The number of backtracks the prop solver needs for a sudoku
+def difficulty(puzzle, k):
+    stats = SolverStats();
+    solve_sudoku_bitmask(puzzle, k, stats=stats);
+    return stats.get("backtracks", 0);
+
+def count_clues(puzzle):
+    return sum(1 for row in puzzle for value in row if value != 0);
+
+### A filled in sudoku, from the standard pattern (each row is the previous one shifted)
+def pattern_solution(k):
+    n = k*k;
+    return [[(k*(rowInd % k) + rowInd // k + colInd) % n + 1 for colInd in range(n)] for rowInd in range(n)];
+
+### Shuffle a filled in sudoku, with transformations that keep it valid:
+### rows within a band, bands, columns within a stack, stacks, the values, and transposing
+def shuffle_solution(solution, k, rng):
+    n = k*k;
+    bands = rng.sample(range(k), k);
+    rows = [band*k + rowInd for band in bands for rowInd in rng.sample(range(k), k)];
+    stacks = rng.sample(range(k), k);
+    cols = [stack*k + colInd for stack in stacks for colInd in rng.sample(range(k), k)];
+    values = [0] + rng.sample(range(1, n+1), n);
+    shuffled = [[values[solution[rowInd][colInd]] for colInd in cols] for rowInd in rows];
+    if rng.random() < 0.5:
+        shuffled = [list(row) for row in zip(*shuffled)];
+    return shuffled;
+
+### Keep a fraction (density) of the cells of a filled in sudoku, and empty the rest
+### (the result has at least one solution, but it need not be unique)
+def random_clues(solution, k, density, rng):
+    n = k*k;
+    kept = set(rng.sample(range(n*n), int(round(density * n*n))));
+    return [[solution[rowInd][colInd] if rowInd*n + colInd in kept else 0 for colInd in range(n)] for rowInd in range(n)];
+
+if __name__ == "__main__":
+    main();
@@ -0,0 +1,28 @@
+import os
+
+from sudoku import parse_sudoku_line
+from sudoku import read_sudokus_from_file
+
+INPUTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inputs")
+
+### A file of n lines of n numbers is a single sudoku if it is a .sudoku file, and one sudoku per line otherwise
+### (here 16 lines of a 4x4 sudoku each, which is also a 16x16 sudoku)
+def test_read_sudokus_by_extension(tmp_path):
+    solution = [1, 2, 3, 4, 3, 4, 1, 2, 2, 1, 4, 3, 4, 3, 2, 1]
+    lines = [[value if cell != index else 0 for cell, value in enumerate(solution)] for index in range(16)]
+    text = "\n".join(" ".join(map(str, line)) for line in lines) + "\n"
+    (tmp_path / "grid.sudoku").write_text(text)
+    (tmp_path / "lines.txt").write_text(text)
+    assert read_sudokus_from_file(str(tmp_path / "grid.sudoku")) == [(4, lines)]
+    sudokus = read_sudokus_from_file(str(tmp_path / "lines.txt"))
+    assert sudokus == [parse_sudoku_line(list(map(str, line))) for line in lines]
+    assert all(k == 2 for k, sudoku in sudokus)
+
+### The other format is used if the file is not in the format of its extension at all
+def test_read_sudokus_fallback(tmp_path):
+    k, easy3 = read_sudokus_from_file(os.path.join(INPUTS, "easy3.sudoku"))[0]
+    (tmp_path / "easy3.txt").write_text("\n".join(" ".join(map(str, row)) for row in easy3) + "\n")
+    assert read_sudokus_from_file(str(tmp_path / "easy3.txt")) == [(3, easy3)]
+    line = " ".join(str(value) for row in easy3 for value in row)
+    (tmp_path / "easy3-line.sudoku").write_text(line + "\n")
+    assert read_sudokus_from_file(str(tmp_path / "easy3-line.sudoku")) == [(3, easy3)]
@@ -0,0 +1,39 @@
+import multiprocessing
+
+import pytest
+
+import sudoku_core
+from sudoku_core import PROPAGATION_RULES
+from sudoku_core import propagate
+from sudoku_core import sat_solutions
+from sudoku_core import solve_sudoku_SAT
+from sudoku_core import solve_sudoku_bitmask
+from sudoku_core import solve_sudoku_portfolio
+
+### k=1 boards have no domains of two values, so the pair rules have nothing to do (and must not fail)
+def test_k1_with_propagation_rules():
+    assert solve_sudoku_bitmask([[0]], 1, rules=PROPAGATION_RULES) == [[1]]
+    assert solve_sudoku_SAT([[0]], 1, reduce=True) == [[1]]
+    assert list(sat_solutions([[0]], 1)) == [[[1]]]
+    assert propagate([[[1]]], 1, rules=PROPAGATION_RULES) == [[[1]]]
+
+### A contradiction is returned as None, and with rules the lists are left as they were
+def test_propagate_contradiction():
+    for rules in [(), PROPAGATION_RULES]:
+        values = [[[1], [1], [1, 2], [1, 2]]] + [[[1, 2, 3, 4] for colInd in range(4)] for rowInd in range(3)]
+        assert propagate(values, 2, rules=rules) is None
+    values = [[[1], [1], [1, 2], [1, 2]]] + [[[1, 2, 3, 4] for colInd in range(4)] for rowInd in range(3)]
+    propagate(values, 2, rules=PROPAGATION_RULES)
+    assert values[0] == [[1], [1], [1, 2], [1, 2]]
+
+### A solver that gives up right away does not decide the race, as long as another one finds a solution
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="the workers only see the patched solvers when forked")
+def test_portfolio_waits_for_a_solution(monkeypatch):
+    monkeypatch.setitem(sudoku_core.SOLVERS, "none", lambda sudoku, k: None)
+    sudoku = [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 1]]
+    stats = {}
+    solution = solve_sudoku_portfolio(sudoku, 2, solvers=("none", "dlx"), stats=stats)
+    assert stats["winner"] == "dlx" and solution[3][3] == 1
+    stats = {}
+    assert solve_sudoku_portfolio([[1, 1, 0, 0]] + sudoku[1:], 2, solvers=("none", "dlx"), stats=stats) is None
+    assert stats["winner"] in ("none", "dlx")
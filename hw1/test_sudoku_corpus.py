@@ -0,0 +1,52 @@
+import os
+
+from sudoku import parse_sudoku_line
+from sudoku_corpus import iter_line_corpus
+from sudoku_corpus import iter_binary_corpus
+from sudoku_corpus import open_binary_corpus
+from sudoku_corpus import parse_sudoku_lines
+from sudoku_corpus import write_binary_corpus
+
+INPUTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inputs")
+
+def sudoku_line(name):
+    with open(os.path.join(INPUTS, name)) as file:
+        return " ".join(file.read().split())
+
+### Malformed lines give (None,None), like parse_sudoku_line, and do not affect the other lines of their chunk
+def test_malformed_lines(tmp_path):
+    easy3 = sudoku_line("easy3.sudoku")
+    compact = easy3.replace(" ", "")
+    lines = [
+        easy3,
+        easy3[:-1] + "a",
+        easy3.replace("0", "x", 1),
+        compact,
+        compact.replace("0", "."),
+        compact[:-1] + "a",
+        "1 2 3",
+        " ".join(["10"] * 81),
+        sudoku_line("easy4.sudoku"),
+    ]
+    filename = tmp_path / "mixed.sudokus"
+    filename.write_text("\n".join(lines) + "\n")
+    expected = [parse_sudoku_line(line.split()) for line in lines]
+    assert list(iter_line_corpus(str(filename))) == expected
+    assert [k for k, sudoku in expected] == [3, None, None, 3, 3, None, None, None, 4]
+    assert parse_sudoku_lines([easy3[:-1] + "a"]) == [(None, None)]
+
+### A line of 81 characters that are not all ASCII is not a sudoku, and does not shift the grids after it
+def test_non_ascii_lines():
+    compact = sudoku_line("easy3.sudoku").replace(" ", "")
+    for line in ["\u00e9" + "0" * 80, "\u00e9" * 81]:
+        lines = [line, compact, line, compact]
+        assert parse_sudoku_lines(lines) == [(None, None), parse_sudoku_line(compact), (None, None), parse_sudoku_line(compact)]
+
+def test_binary_corpus_overwrites_unless_appending(tmp_path):
+    filename = str(tmp_path / "easy.sudokub")
+    k, sudoku = parse_sudoku_line(sudoku_line("easy3.sudoku").split())
+    assert write_binary_corpus(filename, [sudoku] * 4, k) == 4
+    assert write_binary_corpus(filename, [sudoku] * 4, k) == 4
+    assert len(open_binary_corpus(filename)[1]) == 4
+    write_binary_corpus(filename, [sudoku] * 2, k, append=True)
+    assert list(iter_binary_corpus(filename)) == [(k, sudoku)] * 6